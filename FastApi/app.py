@@ -1,69 +1,147 @@
 import os
 import httpx
 import requests
-import jwt
 import logging
 from fastapi import FastAPI, HTTPException, Depends, Request, Security, BackgroundTasks
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from authentication import *
 from dotenv import load_dotenv
-from starlette.responses import RedirectResponse, JSONResponse
-from models import UserCreate, UserLogin, validate_preferences
+from starlette.background import BackgroundTask
+from starlette.responses import RedirectResponse, JSONResponse, StreamingResponse
+from models import RefreshTokenRequest, UserCreate, UserLogin, validate_preferences
 from datetime import datetime, timedelta
 from typing import Dict, List
+from contextlib import asynccontextmanager
+from dapr_client import MANAGER_INVOKE_URL, PUBSUB_NAME, create_http_client, publish_url, route_timeout
+from preferences_cache import PreferencesCache
+from instrumentation import instrument_asgi
+from structured_logging import configure_logging, log_payload
 import subprocess
+import uuid
 
 load_dotenv()
 SERVICE_B_URL = os.getenv('SERVICE_B_URL', 'http://localhost:5000')
-SECRET_KEY = os.getenv("SECRET_KEY", "8d32bfdb101ae60a669b6813e86ce5e5268197f0")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 MANAGER_APP_ID = "flaskmanager"
 
-app = FastAPI()
+# User profiles (username, email, preferences) are cached here, updates invalidate them
+# locally and on the other gateway replicas through the pub/sub topic
+PREFERENCES_CACHE_TTL = float(os.getenv("PREFERENCES_CACHE_TTL", "300"))
+PREFERENCES_CACHE_MAX_ENTRIES = int(os.getenv("PREFERENCES_CACHE_MAX_ENTRIES", "10000"))
+PREFERENCES_INVALIDATION_TOPIC = os.getenv("PREFERENCES_INVALIDATION_TOPIC", "preferences-invalidated")
+INSTANCE_ID = uuid.uuid4().hex
 
-logging.basicConfig(level=logging.INFO)
+preferences_cache = PreferencesCache(ttl=PREFERENCES_CACHE_TTL, max_entries=PREFERENCES_CACHE_MAX_ENTRIES)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for all routes so calls to the sidecar reuse keep-alive connections
+    app.state.http_client = create_http_client()
+    try:
+        yield
+    finally:
+        await app.state.http_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+# Route latency, in-flight requests and trace context, served on /metrics
+instrument_asgi(app)
+
+# JSON logs written by a background thread, levels from LOG_LEVEL / LOG_LEVELS
+configure_logging("gateway")
 logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-async def fetch_user_preferences(user_id: int):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{SERVICE_B_URL}/users/{user_id}/preferences")
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_client
+
+
+async def load_user_profile(client: httpx.AsyncClient, user_id: int):
+    response = await client.get(
+        f"{MANAGER_INVOKE_URL}/users/{user_id}/preferences",
+        headers={"Accept": "application/json"},
+        timeout=route_timeout("preferences")
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def get_user_profile(client: httpx.AsyncClient, user_id: int):
+    """User profile from the cache, loaded through the manager on a miss."""
+    return await preferences_cache.get(user_id, lambda: load_user_profile(client, user_id))
+
+
+async def broadcast_preferences_invalidation(client: httpx.AsyncClient, user_id: int):
+    try:
+        response = await client.post(
+            publish_url(PREFERENCES_INVALIDATION_TOPIC),
+            json={"user_id": user_id, "origin": INSTANCE_ID},
+            timeout=route_timeout("publish")
+        )
         response.raise_for_status()
-        json_response = response.json()
-        logging.info(f"Response from {SERVICE_B_URL}/users/{user_id}/preferences: {json_response}")
-
-        # Extract and log preferences, username, and email
-        preferences = json_response.get("preferences")
-        username = json_response.get("username")
-        email = json_response.get("email")
-        print("Preferences:", preferences)
-        print("Username:", username)
-        print("Email:", email)
-
-        # Check if any of the expected fields are missing
-        if preferences is None or username is None or email is None:
-            logging.error(f"Missing data in response: {json_response}")
-            return None
+    except Exception as e:
+        # Other replicas still drop the entry when its TTL runs out
+        logger.error(f"Failed to broadcast preferences invalidation for user {user_id}: {e}")
+
+
+async def fetch_user_preferences(client: httpx.AsyncClient, user_id: int):
+    json_response = await get_user_profile(client, user_id)
+    log_payload(logger, logging.DEBUG, "Profile of user %s", json_response, user_id)
+
+    # Extract preferences, username, and email
+    preferences = json_response.get("preferences")
+    username = json_response.get("username")
+    email = json_response.get("email")
+
+    # Check if any of the expected fields are missing
+    if preferences is None or username is None or email is None:
+        logger.error(f"Missing data in profile of user {user_id}: fields {sorted(json_response)}")
+        return None
 
     return preferences, username, email
 
 
-async def get_current_user_dapr(token: str = Security(oauth2_scheme)):
+async def get_current_user(token: str = Security(oauth2_scheme)):
+    """Claims of the bearer access token, verified once and then served from the token cache."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print("Decoded JWT payload:", payload)  # Print payload for inspection
-        return payload
-    except jwt.ExpiredSignatureError:
+        return verify_token(token)
+    except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.JWTError:
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+# Both names were separate copies of the same check, routes may use either
+get_current_user_dapr = get_current_user
+
+
+@app.get("/dapr/subscribe", include_in_schema=False)
+async def dapr_subscribe():
+    return [{
+        "pubsubname": PUBSUB_NAME,
+        "topic": PREFERENCES_INVALIDATION_TOPIC,
+        "route": "/events/preferences-invalidated",
+    }]
+
+
+@app.post("/events/preferences-invalidated", include_in_schema=False)
+async def on_preferences_invalidated(request: Request):
+    event = await request.json()
+    data = event.get("data", event)
+    if data.get("origin") != INSTANCE_ID and data.get("user_id") is not None:
+        preferences_cache.invalidate(data["user_id"])
+    return {"status": "SUCCESS"}
+
+
+@app.get("/stats")
+async def stats():
+    return {"preferences_cache": preferences_cache.stats(), "token_cache": token_cache.stats()}
+
+
 # Redirect from / to /docs where the swagger is
 @app.get("/", include_in_schema=False)
 async def root():
@@ -71,13 +149,12 @@ async def root():
 
 
 @app.get("/call_service_b")
-async def call_service_b():
+async def call_service_b(client: httpx.AsyncClient = Depends(get_http_client)):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get("http://flaskmanager:3500/v1.0/invoke/flaskmanager/method/call_service_b")
-            response.raise_for_status()
-            logger.info(f"Service B says: {response.json()}")
-            return {"Service B says": response.json()}
+        response = await client.get(f"{MANAGER_INVOKE_URL}/call_service_b", timeout=route_timeout("probe"))
+        response.raise_for_status()
+        logger.info(f"Service B says: {response.json()}")
+        return {"Service B says": response.json()}
     except httpx.RequestError as e:
         logger.error(f"Request failed: {e}")
         raise HTTPException(status_code=500, detail=f"Request failed: {e}")
@@ -86,13 +163,12 @@ async def call_service_b():
         raise HTTPException(status_code=e.response.status_code, detail=f"HTTP error: {e}")
     
 @app.get("/call_service_u")
-async def call_service_u():
+async def call_service_u(client: httpx.AsyncClient = Depends(get_http_client)):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get("http://flaskmanager:3500/v1.0/invoke/flaskmanager/method/call_service_u")
-            response.raise_for_status()
-            logger.info(f"Service U says: {response.json()}")
-            return {"Service U says": response.json()}
+        response = await client.get(f"{MANAGER_INVOKE_URL}/call_service_u", timeout=route_timeout("probe"))
+        response.raise_for_status()
+        logger.info(f"Service U says: {response.json()}")
+        return {"Service U says": response.json()}
     except httpx.RequestError as e:
         logger.error(f"Request failed: {e}")
         raise HTTPException(status_code=500, detail=f"Request failed: {e}")
@@ -102,13 +178,12 @@ async def call_service_u():
 
 
 @app.get("/call_service_n")
-async def call_service_n():
+async def call_service_n(client: httpx.AsyncClient = Depends(get_http_client)):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get("http://flaskmanager:3500/v1.0/invoke/flaskmanager/method/call_service_n")
-            response.raise_for_status()
-            logger.info(f"Service U says: {response.json()}")
-            return {"Service U says": response.json()}
+        response = await client.get(f"{MANAGER_INVOKE_URL}/call_service_n", timeout=route_timeout("probe"))
+        response.raise_for_status()
+        logger.info(f"Service U says: {response.json()}")
+        return {"Service U says": response.json()}
     except httpx.RequestError as e:
         logger.error(f"Request failed: {e}")
         raise HTTPException(status_code=500, detail=f"Request failed: {e}")
@@ -118,18 +193,18 @@ async def call_service_n():
 
 
 @app.post("/signup")
-async def signup(user: UserCreate):
+async def signup(user: UserCreate, client: httpx.AsyncClient = Depends(get_http_client)):
     try:
-        async with httpx.AsyncClient() as client:
-            # Use Dapr to invoke the service
-            response = await client.post(
-                f"http://flaskmanager:3500/v1.0/invoke/flaskmanager/method/signup",
-                json=user.dict()
-            )
-            response.raise_for_status()  # Raise an exception for HTTP errors (status >= 400)
+        # Use Dapr to invoke the service
+        response = await client.post(
+            f"{MANAGER_INVOKE_URL}/signup",
+            json=user.dict(),
+            timeout=route_timeout("signup")
+        )
+        response.raise_for_status()  # Raise an exception for HTTP errors (status >= 400)
 
-            # If the response is successful, return the JSON data
-            return response.json()
+        # If the response is successful, return the JSON data
+        return response.json()
 
     except httpx.RequestError as e:
         # Handle any request exceptions (e.g., network issues, server errors)
@@ -141,38 +216,58 @@ async def signup(user: UserCreate):
 
 
 @app.post("/token", include_in_schema=False)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(),
+                client: httpx.AsyncClient = Depends(get_http_client)):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"http://flaskmanager:3500/v1.0/invoke/flaskmanager/method/login",
-                json={"username": form_data.username, "password": form_data.password}
-            )
-            response.raise_for_status()
-            user = response.json()
+        response = await client.post(
+            f"{MANAGER_INVOKE_URL}/login",
+            json={"username": form_data.username, "password": form_data.password},
+            timeout=route_timeout("login")
+        )
+        response.raise_for_status()
+        user = response.json()
 
         if 'username' not in user:
             raise ValueError("Unexpected response format: 'username' not found in response")
 
-        # Create access token
-        access_token = create_access_token(user_id=user["user_id"])
+        # Create access token, and a refresh token so the client can renew it without the password
+        tokens = {"access_token": create_access_token(user_id=user["user_id"]), "token_type": "bearer"}
+        if REFRESH_TOKEN_EXPIRE_DAYS > 0:
+            tokens["refresh_token"] = create_refresh_token(user_id=user["user_id"])
 
-        return {"access_token": access_token, "token_type": "bearer"}
+        return tokens
 
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 503:
+            raise HTTPException(status_code=503, detail="Login is temporarily unavailable, try again later.",
+                                headers={"Retry-After": e.response.headers.get("Retry-After", "5")})
+        raise
     except httpx.RequestError as e:
         raise HTTPException(status_code=401, detail=f"Error during authentication: {str(e)}")
     except ValueError as ve:
         raise HTTPException(status_code=500, detail=str(ve))
 
 
-async def get_current_user(token: str = Security(oauth2_scheme)):
+@app.post("/token/refresh")
+async def refresh_access_token(body: RefreshTokenRequest):
+    """New access and refresh tokens for a valid refresh token, checked here without calling the manager.
+
+    The refresh token is rotated: the one sent here cannot be used again.
+    """
+    if REFRESH_TOKEN_EXPIRE_DAYS <= 0:
+        raise HTTPException(status_code=404, detail="Refresh tokens are disabled")
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        claims = use_refresh_token(body.refresh_token)
+    except ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Refresh token has expired")
+    except InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    return {
+        "access_token": create_access_token(user_id=claims["user_id"]),
+        "refresh_token": create_refresh_token(user_id=claims["user_id"]),
+        "token_type": "bearer",
+    }
 
 
 @app.get("/login")
@@ -181,22 +276,15 @@ async def login(user: dict = Depends(get_current_user)):
 
 
 @app.get("/users/me/preferences")
-async def read_user_preferences(current_user: dict = Depends(get_current_user_dapr)):
+async def read_user_preferences(current_user: dict = Depends(get_current_user_dapr),
+                                client: httpx.AsyncClient = Depends(get_http_client)):
     user_id = current_user.get("user_id")
-    print("Requested user ID:", user_id)
+    logger.debug(f"Preferences requested by user {user_id}")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"http://flaskmanager:3500/v1.0/invoke/flaskmanager/method/users/{user_id}/preferences",
-                headers={"Accept": "application/json"}  # Ensure the correct headers are set
-            )
-            response.raise_for_status()
-            json_response = response.json()
-
-            # Debugging: Print the fetched preferences
-            print("Fetched user preferences:", json_response)
-            return json_response
+        json_response = await get_user_profile(client, user_id)
+        log_payload(logger, logging.DEBUG, "Fetched preferences of user %s", json_response, user_id)
+        return json_response
 
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=f"HTTP error from Flask manager: {e}")
@@ -207,21 +295,27 @@ async def read_user_preferences(current_user: dict = Depends(get_current_user_da
 @app.put("/users/me/preferences/update")
 async def update_user_preferences(
         preferences_update: List[str],  # Expecting a list of strings,  # Expecting a list of strings
-        current_user: dict = Depends(get_current_user), ):
+        background_tasks: BackgroundTasks,
+        current_user: dict = Depends(get_current_user),
+        client: httpx.AsyncClient = Depends(get_http_client), ):
     user_id = current_user.get("user_id")
-    print("Updating preferences for user ID:", user_id)
-    print("Received preferences update:", preferences_update)  # Log received data for debugging
+    logger.info(f"Updating preferences of user {user_id}")
+    log_payload(logger, logging.DEBUG, "Preferences update of user %s", preferences_update, user_id)
 
     try:
-        async with httpx.AsyncClient() as client:
-            # Send preferences update to Flask manager via Dapr
-            update_response = await client.put(
-                f"http://flaskmanager:3500/v1.0/invoke/flaskmanager/method/users/{user_id}/preferences/update",
-                json={"preferences": preferences_update}
-            )
-            update_response.raise_for_status()
+        # Send preferences update to Flask manager via Dapr
+        update_response = await client.put(
+            f"{MANAGER_INVOKE_URL}/users/{user_id}/preferences/update",
+            json={"preferences": preferences_update},
+            timeout=route_timeout("preferences")
+        )
+        update_response.raise_for_status()
+
+        # Drop the cached profile here and on the other replicas
+        preferences_cache.invalidate(user_id)
+        background_tasks.add_task(broadcast_preferences_invalidation, client, user_id)
 
-            return {"message": "Preferences updated successfully"}
+        return {"message": "Preferences updated successfully"}
 
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=f"HTTP error from Flask manager: {e}")
@@ -229,30 +323,99 @@ async def update_user_preferences(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.get("/users/me/news")
-async def get_news(background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
+async def get_news(current_user: dict = Depends(get_current_user),
+                   client: httpx.AsyncClient = Depends(get_http_client)):
     user_id = current_user.get("user_id")
-    timeout = httpx.Timeout(5 * 60 * 60)
 
     # Fetch user preferences
-    preferences, username, email = await fetch_user_preferences(user_id)
+    preferences, username, email = await fetch_user_preferences(client, user_id)
 
-    background_tasks.add_task(send_news_request, user_id, preferences, username, email, timeout)
+    # The manager only queues the request, so wait for it and pass a full queue (429) on.
+    # A repeated request gets the job already running for it, poll it on /users/me/news/{job_id}
+    job = await send_news_request(client, user_id, preferences, username, email)
 
-    return {"message": "News fetch request sent successfully and will be processed soon."}
+    return {"message": "News fetch request sent successfully and will be processed soon.",
+            "job_id": job.get("job_id"), "status": job.get("status"), "deduplicated": job.get("deduplicated")}
 
-async def send_news_request(user_id, preferences, username, email, timeout):
+
+@app.get("/users/me/news/stream")
+async def stream_news(current_user: dict = Depends(get_current_user),
+                      client: httpx.AsyncClient = Depends(get_http_client)):
+    """Server-Sent Events with the user's articles as each category is ready.
+
+    `article` events come first for cached categories, `summary` events fill in the
+    summaries that were still missing and `done` ends the stream.
+    """
+    user_id = current_user.get("user_id")
+    preferences, username, email = await fetch_user_preferences(client, user_id)
+
+    upstream = client.build_request(
+        "GET", f"{MANAGER_INVOKE_URL}/users/{user_id}/news/stream",
+        params={"category": preferences},
+        timeout=route_timeout("stream")
+    )
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                f"http://flaskmanager:3500/v1.0/invoke/flaskmanager/method/users/{user_id}/news",
-                json={"preferences": preferences, "username": username, "email": email}
-            )
-            response.raise_for_status()
-            logging.info(f"News fetch request processed successfully for user {user_id}")
+        response = await client.send(upstream, stream=True)
+    except httpx.RequestError as e:
+        logger.error(f"Request to Flask manager failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Request failed: {e}")
+    if response.status_code != 200:
+        body = await response.aread()
+        await response.aclose()
+        logger.error(f"HTTP error {response.status_code} from Flask manager on the news stream of user {user_id}")
+        raise HTTPException(status_code=response.status_code, detail=f"HTTP error from Flask manager: {body.decode(errors='replace')}")
+
+    # Events are passed on as they arrive, the upstream response is closed when the stream ends
+    return StreamingResponse(response.aiter_raw(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                             background=BackgroundTask(response.aclose))
+
+
+@app.get("/users/me/news/{job_id}")
+async def get_news_job(job_id: str,
+                       current_user: dict = Depends(get_current_user),
+                       client: httpx.AsyncClient = Depends(get_http_client)):
+    user_id = current_user.get("user_id")
+    try:
+        response = await client.get(
+            f"{MANAGER_INVOKE_URL}/users/{user_id}/news/{job_id}",
+            headers={"Accept": "application/json"},
+            timeout=route_timeout("probe")
+        )
+        response.raise_for_status()
+        return response.json()
     except httpx.HTTPStatusError as e:
-        logging.error(f"HTTP error from News Aggregation Manager: {e.response.text}")
-    except Exception as e:
-        logging.error(f"Internal server error: {str(e)}")
+        if e.response.status_code == 404:
+            raise HTTPException(status_code=404, detail="News job not found")
+        raise HTTPException(status_code=e.response.status_code, detail=f"HTTP error from Flask manager: {e}")
+    except httpx.RequestError as e:
+        logger.error(f"Request to Flask manager failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Request failed: {e}")
+
+
+async def send_news_request(client, user_id, preferences, username, email):
+    try:
+        response = await client.post(
+            f"{MANAGER_INVOKE_URL}/users/{user_id}/news",
+            json={"preferences": preferences, "username": username, "email": email},
+            timeout=route_timeout("news")
+        )
+        response.raise_for_status()
+        job = response.json()
+        if job.get("deduplicated"):
+            logger.info(f"News request of user {user_id} joined job {job.get('job_id')}")
+        else:
+            logger.info(f"News fetch request queued for user {user_id} as job {job.get('job_id')}")
+        return job
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error from Flask manager: {e.response.text}")
+        if e.response.status_code == 429:
+            raise HTTPException(status_code=429, detail="Too many news requests, try again later.",
+                                headers={"Retry-After": e.response.headers.get("Retry-After", "30")})
+        raise HTTPException(status_code=e.response.status_code, detail=f"HTTP error from Flask manager: {e}")
+    except httpx.RequestError as e:
+        logger.error(f"Request to Flask manager failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Request failed: {e}")
 
 
 if __name__ == "__main__":
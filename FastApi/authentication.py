@@ -1,33 +1,204 @@
 import os
+import time
+import uuid
 import jwt
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from jwt import encode as jwt_encode, ExpiredSignatureError
+from jwt import encode as jwt_encode, ExpiredSignatureError, InvalidTokenError
 from dotenv import load_dotenv
+from instrumentation import record_cache
 
 SECRET_KEY = os.getenv("SECRET_KEY", "8d32bfdb101ae60a669b6813e86ce5e5268197f0")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# PEM key files for asymmetric algorithms (RS256, EdDSA, ...). With only the public key
+# the gateway can verify tokens but not issue them
+JWT_PRIVATE_KEY_FILE = os.getenv("JWT_PRIVATE_KEY_FILE")
+JWT_PUBLIC_KEY_FILE = os.getenv("JWT_PUBLIC_KEY_FILE")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# Refresh tokens get a new access token without logging in again, 0 (the default) disables them
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "0"))
+# Verified access tokens are cached until they expire, at most TOKEN_CACHE_TTL seconds
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
 
 
-def create_access_token(user_id: int):
-    try:
-        data = {
-            "sub": str(user_id),  # Assuming user_id is an integer, convert it to string for JWT
-            "user_id": user_id,  # Add user_id directly to the JWT payload
-            "exp": datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+def load_keys(algorithm, secret_key=SECRET_KEY, private_key_file=None, public_key_file=None):
+    """(signing_key, verifying_key) for the algorithm.
+
+    HMAC algorithms use the shared secret. Asymmetric keys are parsed once here instead
+    of on every encode/decode. The public key is derived from the private key when no
+    public key file is given.
+    """
+    if algorithm.startswith("HS"):
+        return secret_key, secret_key
+
+    from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+
+    signing_key = verifying_key = None
+    if private_key_file:
+        with open(private_key_file, "rb") as f:
+            signing_key = load_pem_private_key(f.read(), password=None)
+        verifying_key = signing_key.public_key()
+    if public_key_file:
+        with open(public_key_file, "rb") as f:
+            verifying_key = load_pem_public_key(f.read())
+    if verifying_key is None:
+        raise RuntimeError(f"{algorithm} needs JWT_PRIVATE_KEY_FILE or JWT_PUBLIC_KEY_FILE")
+    return signing_key, verifying_key
+
+
+SIGNING_KEY, VERIFYING_KEY = load_keys(ALGORITHM, SECRET_KEY, JWT_PRIVATE_KEY_FILE, JWT_PUBLIC_KEY_FILE)
+
+
+class TokenCache:
+    """LRU cache of verified tokens -> claims.
+
+    An entry is dropped when the token expires or after `ttl` seconds, whichever comes
+    first, and the least recently used ones are evicted past `max_entries`. Only
+    successfully verified tokens are stored. Runs on the gateway's event loop only, so
+    no locking is needed.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, token: str):
+        entry = self._entries.get(token)
+        if entry is not None:
+            expires_at, claims = entry
+            if expires_at > time.time():
+                self.hits += 1
+                record_cache("token", "hit")
+                self._entries.move_to_end(token)
+                return claims
+            del self._entries[token]
+        self.misses += 1
+        record_cache("token", "miss")
+        return None
+
+    def put(self, token: str, claims: dict):
+        if self.max_entries <= 0:
+            return
+        expires_at = min(claims["exp"], time.time() + self.ttl)
+        self._entries[token] = (expires_at, claims)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "algorithm": ALGORITHM,
         }
-        encoded_jwt = jwt_encode(data, SECRET_KEY, algorithm=ALGORITHM)
-        return encoded_jwt
-    except ExpiredSignatureError:
-        raise ValueError("Token has expired")
+
+
+token_cache = TokenCache(max_entries=TOKEN_CACHE_MAX_ENTRIES, ttl=TOKEN_CACHE_TTL)
+
+
+class RevokedTokens:
+    """Ids (jti) of refresh tokens that were used or revoked, kept until the tokens expire.
+
+    Refresh tokens are rotated: each one is accepted once, so a leaked token stops
+    working as soon as it or its replacement is used. The list lives in the gateway
+    process. Runs on the gateway's event loop only, so no locking is needed.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+
+    def revoke(self, jti: str, expires_at: float):
+        self._prune()
+        self._entries[jti] = expires_at
+
+    def is_revoked(self, jti: str):
+        return jti in self._entries
+
+    def _prune(self):
+        # Expired tokens are rejected by their signature check anyway. Refresh tokens all
+        # have the same lifetime, so the entries are roughly in expiry order
+        now = time.time()
+        while self._entries:
+            jti, expires_at = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[jti]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+revoked_refresh_tokens = RevokedTokens()
+
+
+def _create_token(user_id: int, token_type: str, expires_delta: timedelta):
+    if SIGNING_KEY is None:
+        raise ValueError(f"No private key configured to sign {ALGORITHM} tokens")
+    now = datetime.utcnow()
+    data = {
+        "sub": str(user_id),  # Assuming user_id is an integer, convert it to string for JWT
+        "user_id": user_id,  # Add user_id directly to the JWT payload
+        "type": token_type,
+        "iat": now,
+        "exp": now + expires_delta,
+    }
+    if token_type == "refresh":
+        data["jti"] = uuid.uuid4().hex
+    return jwt_encode(data, SIGNING_KEY, algorithm=ALGORITHM)
+
+
+def create_access_token(user_id: int):
+    return _create_token(user_id, "access", timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+
+
+def create_refresh_token(user_id: int):
+    return _create_token(user_id, "refresh", timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+
+
+def verify_token(token: str, token_type: str = "access", cache: TokenCache = token_cache):
+    """Claims of a valid token, raises ExpiredSignatureError or InvalidTokenError.
+
+    Access tokens are served from the cache after the first verification. Tokens
+    issued before the "type" claim existed count as access tokens, a refresh token is
+    never accepted as an access token.
+    """
+    use_cache = cache is not None and token_type == "access"
+    if use_cache:
+        claims = cache.get(token)
+        if claims is not None:
+            return claims
+
+    claims = jwt.decode(token, VERIFYING_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+    if claims.get("type", "access") != token_type:
+        raise InvalidTokenError(f"Expected a token of type {token_type}")
+    if use_cache:
+        cache.put(token, claims)
+    return claims
+
+
+def use_refresh_token(token: str, revoked: RevokedTokens = revoked_refresh_tokens):
+    """Claims of a valid refresh token, which cannot be used again afterwards.
+
+    Raises ExpiredSignatureError or InvalidTokenError, also for a token that was
+    already used or revoked.
+    """
+    claims = verify_token(token, token_type="refresh")
+    jti = claims.get("jti")
+    if not jti or revoked.is_revoked(jti):
+        raise InvalidTokenError("Refresh token was already used or revoked")
+    revoked.revoke(jti, claims["exp"])
+    return claims
 
 
 def decode_access_token(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(payload)
-        return payload
-    except jwt.ExpiredSignatureError:
+        return verify_token(token)
+    except InvalidTokenError:
         return None
-    except jwt.JWTError:
-        return None
\ No newline at end of file
@@ -0,0 +1,65 @@
+import os
+import httpx
+from instrumentation import httpx_transport
+
+# Base URL for invoking the Flask manager through its Dapr sidecar
+MANAGER_INVOKE_URL = os.getenv("MANAGER_INVOKE_URL", "http://flaskmanager:3500/v1.0/invoke/flaskmanager/method")
+
+# Pub/sub through the gateway's own sidecar (dapr/components/pubsub.yaml)
+DAPR_PUBLISH_URL = os.getenv("DAPR_PUBLISH_URL", "http://localhost:3501/v1.0/publish")
+PUBSUB_NAME = os.getenv("PUBSUB_NAME", "pubsub")
+
+# Connection pool settings for the shared client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Default timeout for every call, routes override it through ROUTE_TIMEOUTS
+HTTP_DEFAULT_TIMEOUT = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+ROUTE_TIMEOUTS = {
+    "probe": httpx.Timeout(float(os.getenv("HTTP_PROBE_TIMEOUT", "5")), connect=HTTP_CONNECT_TIMEOUT),
+    "signup": httpx.Timeout(float(os.getenv("HTTP_SIGNUP_TIMEOUT", "10")), connect=HTTP_CONNECT_TIMEOUT),
+    "login": httpx.Timeout(float(os.getenv("HTTP_LOGIN_TIMEOUT", "10")), connect=HTTP_CONNECT_TIMEOUT),
+    "preferences": httpx.Timeout(float(os.getenv("HTTP_PREFERENCES_TIMEOUT", "10")), connect=HTTP_CONNECT_TIMEOUT),
+    "publish": httpx.Timeout(float(os.getenv("HTTP_PUBLISH_TIMEOUT", "5")), connect=HTTP_CONNECT_TIMEOUT),
+    # The manager queues news requests and answers right away
+    "news": httpx.Timeout(float(os.getenv("HTTP_NEWS_TIMEOUT", "10")), connect=HTTP_CONNECT_TIMEOUT),
+    # News streams stay open for as long as the articles take. The news aggregation
+    # service writes a keep-alive every STREAM_KEEPALIVE_INTERVAL (15s), so only a
+    # read gap well above that fails
+    "stream": httpx.Timeout(HTTP_DEFAULT_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT,
+                            read=float(os.getenv("HTTP_STREAM_READ_TIMEOUT", "60"))),
+}
+
+
+def route_timeout(route: str) -> httpx.Timeout:
+    """Return the timeout configured for a route, or the default one."""
+    return ROUTE_TIMEOUTS.get(route, httpx.Timeout(HTTP_DEFAULT_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT))
+
+
+def publish_url(topic: str) -> str:
+    return f"{DAPR_PUBLISH_URL}/{PUBSUB_NAME}/{topic}"
+
+
+def create_http_client(
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP2_ENABLED,
+) -> httpx.AsyncClient:
+    """Create the pooled client shared by every gateway route.
+
+    Calls carry the trace headers of the request and are timed per sidecar host.
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    return httpx.AsyncClient(
+        transport=httpx_transport(limits=limits, http2=http2),
+        timeout=httpx.Timeout(HTTP_DEFAULT_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    )
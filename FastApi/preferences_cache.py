@@ -0,0 +1,90 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from instrumentation import record_cache
+
+
+class PreferencesCache:
+    """Read-through TTL cache of user profiles (username, email, preferences) by user id.
+
+    Entries expire after `ttl` seconds and the least recently used ones are evicted
+    past `max_entries`. Concurrent misses for the same user share one load, which
+    keeps running when the request that started it is cancelled. A load that was in
+    flight while the user was invalidated is returned to its callers but not cached,
+    so an update is never hidden by an older read.
+    Runs on the gateway's event loop only, so no locking is needed.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._loading: Dict[int, asyncio.Task] = {}
+        self._invalidated_while_loading: Set[int] = set()
+
+    async def get(self, user_id: int, load: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                record_cache("preferences", "hit")
+                self._entries.move_to_end(user_id)
+                return value
+            del self._entries[user_id]
+        self.misses += 1
+        record_cache("preferences", "miss")
+
+        task = self._loading.get(user_id)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # The load is a task of its own and every caller awaits it shielded, so a
+            # cancelled caller (e.g. a client that disconnected) does not fail the others
+            task = asyncio.ensure_future(self._load(user_id, load))
+            # Retrieve the error even when every caller was cancelled, so it does not warn
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._loading[user_id] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, user_id: int, load: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await load()
+        except BaseException:
+            # Nothing is cached, the next load starts clean
+            self._invalidated_while_loading.discard(user_id)
+            raise
+        finally:
+            self._loading.pop(user_id, None)
+
+        if user_id in self._invalidated_while_loading:
+            self._invalidated_while_loading.discard(user_id)
+        else:
+            self._entries[user_id] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id: int) -> None:
+        self.invalidations += 1
+        self._entries.pop(user_id, None)
+        if user_id in self._loading:
+            self._invalidated_while_loading.add(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl,
+        }
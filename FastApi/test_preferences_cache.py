@@ -0,0 +1,28 @@
+import asyncio
+
+from preferences_cache import PreferencesCache
+
+
+def test_cancelled_leader_does_not_fail_the_waiters():
+    async def scenario():
+        cache = PreferencesCache()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"preferences": ["top"]}
+
+        leader = asyncio.ensure_future(cache.get(1, load))
+        waiter = asyncio.ensure_future(cache.get(1, load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        assert await waiter == {"preferences": ["top"]}
+        assert leader.cancelled()
+        # The load finished and was cached for the next request
+        assert await cache.get(1, load) == {"preferences": ["top"]}
+        assert len(calls) == 1
+        assert cache.stats()["coalesced"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,58 @@
+import os
+import httpx
+from instrumentation import httpx_transport
+
+# Base URLs for invoking the services through their Dapr sidecars
+USER_MANAGEMENT_INVOKE_URL = os.getenv(
+    "USER_MANAGEMENT_INVOKE_URL", "http://user_management:3503/v1.0/invoke/user_management/method")
+NEWS_AGGREGATION_INVOKE_URL = os.getenv(
+    "NEWS_AGGREGATION_INVOKE_URL", "http://news_aggregation:3502/v1.0/invoke/news_aggregation/method")
+
+# Connection pool settings for each shared client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Default timeout for every call, routes override it through ROUTE_TIMEOUTS
+HTTP_DEFAULT_TIMEOUT = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+ROUTE_TIMEOUTS = {
+    "probe": httpx.Timeout(float(os.getenv("HTTP_PROBE_TIMEOUT", "5")), connect=HTTP_CONNECT_TIMEOUT),
+    "login": httpx.Timeout(float(os.getenv("HTTP_LOGIN_TIMEOUT", "10")), connect=HTTP_CONNECT_TIMEOUT),
+    "preferences": httpx.Timeout(float(os.getenv("HTTP_PREFERENCES_TIMEOUT", "10")), connect=HTTP_CONNECT_TIMEOUT),
+    # News requests fetch and summarize articles before they return
+    "news": httpx.Timeout(float(os.getenv("HTTP_NEWS_TIMEOUT", str(30 * 60))), connect=HTTP_CONNECT_TIMEOUT),
+    # News streams stay open for as long as the articles take. The news aggregation
+    # service writes a keep-alive every STREAM_KEEPALIVE_INTERVAL (15s), so only a
+    # read gap well above that fails
+    "stream": httpx.Timeout(HTTP_DEFAULT_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT,
+                            read=float(os.getenv("HTTP_STREAM_READ_TIMEOUT", "60"))),
+}
+
+
+def route_timeout(route: str) -> httpx.Timeout:
+    """Return the timeout configured for a route, or the default one."""
+    return ROUTE_TIMEOUTS.get(route, httpx.Timeout(HTTP_DEFAULT_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT))
+
+
+def create_http_client(
+        base_url: str,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+) -> httpx.AsyncClient:
+    """Create the pooled client shared by every manager route calling one sidecar.
+
+    Calls carry the trace headers of the request and are timed per sidecar host.
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    return httpx.AsyncClient(
+        base_url=base_url,
+        transport=httpx_transport(limits=limits),
+        timeout=httpx.Timeout(HTTP_DEFAULT_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    )
@@ -1,56 +1,75 @@
 from flask import Flask, request, jsonify
-import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import json
+import logging
 import os
+import atexit
 from dotenv import load_dotenv
+from smtp_pool import SMTPPool
+from instrumentation import instrument_flask, time_upstream
+from structured_logging import configure_logging, log_payload
 
 load_dotenv()
+# JSON logs written by a background thread, levels from LOG_LEVEL / LOG_LEVELS
+configure_logging("email_bot")
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
+# Route latency, in-flight requests and trace context, served on /metrics
+instrument_flask(app)
 
 EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
 SMTP_SERVER = os.getenv('SMTP_SERVER')
-SMTP_PORT = os.getenv('SMTP_PORT')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() in ('1', 'true', 'yes')
+# Pooled SMTP sessions, each reused for up to SMTP_MAX_MESSAGES_PER_CONNECTION messages
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '4'))
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', '100'))
+
+smtp_pool = SMTPPool(
+    SMTP_SERVER, SMTP_PORT, EMAIL_ADDRESS, EMAIL_PASSWORD,
+    size=SMTP_POOL_SIZE,
+    starttls=SMTP_STARTTLS,
+    max_messages_per_connection=SMTP_MAX_MESSAGES_PER_CONNECTION,
+)
+atexit.register(smtp_pool.close)
+
+
+def build_message(news_data, username, email):
+    msg = MIMEMultipart()
+    msg['From'] = f"Zion-net {EMAIL_ADDRESS}"
+    msg['To'] = email
+    msg['Subject'] = "Latest News"
+
+    body = f"Hello {username},\n\nHere are the latest news articles based on your preferences:\n\n"
+    for article in news_data:
+        category = ", ".join(article['category']) if isinstance(article['category'], list) else article['category']
+        summary = article['summary']
+        if isinstance(summary, str):
+            try:
+                summary_dict = json.loads(summary)
+                summary = summary_dict.get('summary', summary)
+            except json.JSONDecodeError:
+                pass
+
+        body += (
+            f"Category: {category}\n"
+            f"Title: {article['title']}\n"
+            f"Description: {article['description']}\n"
+            f"Link: {article['link']}\n"
+            f"Summary: {summary}\n\n"
+        )
+
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
 
 
 def send_email(news_data, username, email):
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = f"Zion-net {EMAIL_ADDRESS}"
-        msg['To'] = email
-        msg['Subject'] = "Latest News"
-
-        body = f"Hello {username},\n\nHere are the latest news articles based on your preferences:\n\n"
-        for article in news_data:
-            category = ", ".join(article['category']) if isinstance(article['category'], list) else article['category']
-            summary = article['summary']
-            if isinstance(summary, str):
-                try:
-                    summary_dict = json.loads(summary)
-                    summary = summary_dict.get('summary', summary)
-                except json.JSONDecodeError:
-                    pass
-
-            body += (
-                f"Category: {category}\n"
-                f"Title: {article['title']}\n"
-                f"Description: {article['description']}\n"
-                f"Link: {article['link']}\n"
-                f"Summary: {summary}\n\n"
-            )
-
-        msg.attach(MIMEText(body, 'plain'))
-
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.send_message(msg)
-
-        print("Email sent successfully")
-    except Exception as e:
-        print(f"Failed to send email: {str(e)}")
+    with time_upstream("smtp", "send"):
+        smtp_pool.send(build_message(news_data, username, email))
+    logger.info(f"Email sent to {email}")
 
 
 @app.route("/send_email", methods=["POST"])
@@ -59,11 +78,34 @@ def send_email_route():
     news_data = data.get("news")
     username = request.json.get("username")
     email = request.json.get("email")
-    print(email, news_data, username)
-    send_email(news_data, username, email)
+    log_payload(logger, logging.DEBUG, "News for %s", news_data, email)
+    try:
+        send_email(news_data, username, email)
+    except Exception as e:
+        # A failed send is reported to the caller, so the delivery worker retries it
+        logger.error(f"Failed to send email to {email}: {str(e)}")
+        return jsonify({"status": "error", "message": f"Failed to send email: {e}"}), 502
 
     return jsonify({"status": "success", "message": "Email sent successfully"})
 
 
+@app.route("/send_emails", methods=["POST"])
+def send_emails_route():
+    # Batch of {"news": [...], "username": ..., "email": ...} items, e.g. a daily digest
+    items = request.json.get("emails", [])
+    messages = [build_message(item.get("news", []), item.get("username"), item.get("email")) for item in items]
+    with time_upstream("smtp", "send_batch") as timer:
+        failed = smtp_pool.send_batch(messages)
+        if failed:
+            timer.outcome = "partial"
+    logger.info(f"Sent {len(messages) - len(failed)} of {len(messages)} emails")
+
+    return jsonify({
+        "status": "success" if not failed else "partial",
+        "sent": len(messages) - len(failed),
+        "failed": [{"email": email, "error": error} for email, error in failed],
+    })
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8004, debug=True)
@@ -0,0 +1,121 @@
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Errors after which a connection cannot be reused
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPHeloError, OSError)
+
+
+class PooledConnection:
+    def __init__(self, server):
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+        self.broken = False
+
+    def alive(self):
+        try:
+            return self.server.noop()[0] == 250
+        except CONNECTION_ERRORS:
+            return False
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class SMTPPool:
+    """Pool of long-lived, authenticated SMTP sessions.
+
+    A session is opened (connect, STARTTLS, login) once and reused for up to
+    max_messages_per_connection messages. Sessions idle for longer than idle_check
+    seconds are checked with NOOP before use, and a send that fails because the
+    server dropped the connection is retried once on a fresh session.
+    """
+
+    def __init__(self, host, port, username=None, password=None, size=4, starttls=True,
+                 max_messages_per_connection=100, idle_check=30.0, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.starttls = starttls
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_check = idle_check
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="smtp")
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        return PooledConnection(server)
+
+    @contextmanager
+    def connection(self, fresh=False):
+        """A pooled session, or a new one with `fresh` (the idle ones may be as stale)."""
+        with self._slots:
+            conn = None
+            if not fresh:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+            if conn is not None and time.monotonic() - conn.last_used > self.idle_check and not conn.alive():
+                conn.close()
+                conn = None
+            if conn is None:
+                conn = self._connect()
+
+            try:
+                yield conn
+            finally:
+                conn.last_used = time.monotonic()
+                if conn.broken or conn.sent >= self.max_messages_per_connection:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+
+    def send(self, msg):
+        for attempt in range(2):
+            # The retry does not take another idle session, a server restart broke those too
+            with self.connection(fresh=attempt > 0) as conn:
+                try:
+                    conn.server.send_message(msg)
+                    conn.sent += 1
+                    return
+                except CONNECTION_ERRORS:
+                    conn.broken = True
+                    if attempt == 1:
+                        raise
+
+    def send_batch(self, messages):
+        """Send messages over all pooled connections, returns [(recipient, error)] for failures."""
+        def send_one(msg):
+            try:
+                self.send(msg)
+                return None
+            except Exception as e:
+                return msg['To'], str(e)
+
+        return [failure for failure in self._executor.map(send_one, messages) if failure]
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,31 @@
+import smtplib
+
+import app
+
+
+NEWS = {
+    "news": [{"category": ["top"], "title": "Title", "description": "Description", "link": "https://example.com",
+              "summary": "Summary"}],
+    "username": "alice",
+    "email": "alice@example.com",
+}
+
+
+def test_failed_send_is_reported_to_the_caller(monkeypatch):
+    def send(message):
+        raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+    monkeypatch.setattr(app.smtp_pool, "send", send)
+    response = app.app.test_client().post("/send_email", json=NEWS)
+
+    assert response.status_code == 502
+    assert "Connection unexpectedly closed" in response.get_json()["message"]
+
+
+def test_sent_email_returns_success(monkeypatch):
+    sent = []
+    monkeypatch.setattr(app.smtp_pool, "send", sent.append)
+    response = app.app.test_client().post("/send_email", json=NEWS)
+
+    assert response.status_code == 200
+    assert sent[0]["To"] == "alice@example.com"
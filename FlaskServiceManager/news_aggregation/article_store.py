@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+
+from news_cache import link_key
+
+# Fields kept per article, the rest of the news API payload is dropped
+ARTICLE_FIELDS = ("article_id", "title", "description", "link", "pubDate", "source_id", "category", "summary")
+
+
+def compact_article(result):
+    article = {field: result.get(field) for field in ARTICLE_FIELDS if result.get(field) is not None}
+    article["category"] = list(set(result.get("category") or []))
+    return article
+
+
+class ArticleStore:
+    """In-memory store of every article on the cached category pages.
+
+    Articles are deduped by link (an article listed under several categories is
+    stored once) and each category keeps a precomputed tuple of article keys in
+    the order the news API ranked them, so selecting articles for a user does not
+    touch the network.
+    """
+
+    def __init__(self):
+        self._articles = {}
+        self._categories = {}
+        self._lock = threading.Lock()
+
+    def index_category(self, category, articles):
+        """Replace the article list of a category."""
+        with self._lock:
+            keys = []
+            indexed = set()
+            for article in articles:
+                key = link_key(article["link"])
+                if key in indexed:
+                    continue
+                indexed.add(key)
+                existing = self._articles.get(key)
+                if existing is not None and existing.get("summary") and not article.get("summary"):
+                    article["summary"] = existing["summary"]
+                self._articles[key] = article
+                keys.append(key)
+
+            previous = self._categories.get(category, ())
+            self._categories[category] = tuple(keys)
+
+            # Drop articles that are no longer listed under any category
+            for key in set(previous) - indexed:
+                if not any(key in other for other in self._categories.values()):
+                    self._articles.pop(key, None)
+
+    def select(self, categories, k, exclude=()):
+        """Pick up to k articles, taking the best remaining one from each category in turn.
+
+        Returns (key, article) pairs, skipping keys in `exclude` and duplicates.
+        """
+        with self._lock:
+            lists = [self._categories.get(category, ()) for category in categories]
+            positions = [0] * len(lists)
+            seen = set(exclude)
+            selected = []
+            while len(selected) < k:
+                found = False
+                for i, keys in enumerate(lists):
+                    while positions[i] < len(keys) and keys[positions[i]] in seen:
+                        positions[i] += 1
+                    if positions[i] == len(keys):
+                        continue
+                    key = keys[positions[i]]
+                    positions[i] += 1
+                    seen.add(key)
+                    selected.append((key, self._articles[key]))
+                    found = True
+                    if len(selected) == k:
+                        break
+                if not found:
+                    break
+            return selected
+
+    def stats(self):
+        with self._lock:
+            return {
+                "articles": len(self._articles),
+                "categories": {category: len(keys) for category, keys in self._categories.items()},
+            }
+
+
+class SentArticles:
+    """Remembers which article keys were already sent to each user.
+
+    Bounded in both directions: the least recently served users are forgotten past
+    max_users and only the last max_per_user keys are kept for a user.
+    """
+
+    def __init__(self, max_users=100000, max_per_user=200):
+        self.max_users = max_users
+        self.max_per_user = max_per_user
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            keys = self._users.get(user_id)
+            return set(keys) if keys else set()
+
+    def add(self, user_id, keys):
+        with self._lock:
+            sent = self._users.setdefault(user_id, OrderedDict())
+            self._users.move_to_end(user_id)
+            for key in keys:
+                sent[key] = True
+                sent.move_to_end(key)
+            while len(sent) > self.max_per_user:
+                sent.popitem(last=False)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
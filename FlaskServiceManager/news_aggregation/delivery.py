@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from functools import partial
+
+import pika
+from aiohttp import ClientSession, ClientTimeout
+
+from instrumentation import aiohttp_trace_config
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_QUEUE = 'delivery_queue'
+DEAD_LETTER_QUEUE = 'delivery_dead_letter'
+
+
+async def send_with_retry(session, name, url, payload, max_attempts=4, backoff=1.0):
+    """POST the payload to one channel, retrying with jittered exponential backoff.
+
+    Returns None on success or the last error message.
+    """
+    error = None
+    for attempt in range(1, max_attempts + 1):
+        try:
+            async with session.post(url, json=payload) as response:
+                response.raise_for_status()
+            logger.info(f"Data sent to {name} successfully")
+            return None
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"Failed to send data to {name} (attempt {attempt}/{max_attempts}): {error}")
+            if attempt < max_attempts:
+                await asyncio.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.8, 1.2))
+    return error
+
+
+async def deliver(session, job, channels, max_attempts=4, backoff=1.0):
+    """Send a delivery job to all its channels concurrently, returns {channel: error} for failures."""
+    targets = job.get("channels") or list(channels)
+    payload = {"news": job["news"], "username": job["username"], "email": job["email"]}
+    errors = await asyncio.gather(*(
+        send_with_retry(session, name, channels[name], payload, max_attempts, backoff) for name in targets
+    ))
+    return {name: error for name, error in zip(targets, errors) if error}
+
+
+async def deliver_now(job, channels, max_attempts=4, backoff=1.0, timeout=30):
+    """Deliver without the queue, used when a job cannot be published."""
+    async with ClientSession(timeout=ClientTimeout(total=timeout), trace_configs=[aiohttp_trace_config()]) as session:
+        return await deliver(session, job, channels, max_attempts, backoff)
+
+
+class DeliveryWorker:
+    """Consumes delivery jobs and sends them to every channel.
+
+    Each worker has its own RabbitMQ connection, and an event loop with its HTTP
+    session on a thread of its own: jobs are sent there while the connection thread
+    keeps serving heartbeats, then acked back on the connection thread. Channels that
+    still fail after max_attempts are written to the dead-letter queue with their
+    errors, the job is acked either way.
+    """
+
+    def __init__(self, rabbitmq_url, channels, max_attempts=4, backoff=1.0, prefetch_count=1, timeout=30):
+        self.rabbitmq_url = rabbitmq_url
+        self.channels = channels
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.prefetch_count = prefetch_count
+        self.timeout = timeout
+        self.loop = None
+        self.session = None
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="delivery-loop", daemon=True).start()
+        self.session = asyncio.run_coroutine_threadsafe(self._create_session(), self.loop).result()
+        attempt = 0
+        while True:
+            try:
+                connection = pika.BlockingConnection(pika.URLParameters(self.rabbitmq_url))
+                channel = connection.channel()
+                channel.queue_declare(queue=DELIVERY_QUEUE, durable=True)
+                channel.queue_declare(queue=DEAD_LETTER_QUEUE, durable=True)
+                channel.basic_qos(prefetch_count=self.prefetch_count)
+                channel.basic_consume(queue=DELIVERY_QUEUE, on_message_callback=partial(self.on_message, connection))
+                logger.info(f"Started consuming from queue {DELIVERY_QUEUE}...")
+                attempt = 0
+                channel.start_consuming()
+            except pika.exceptions.AMQPConnectionError as e:
+                attempt += 1
+                sleep_time = min(2 ** attempt, 60)
+                logger.error(f"Failed to connect to RabbitMQ: {e}, retrying in {sleep_time} seconds...")
+                time.sleep(sleep_time)
+            except Exception as e:
+                logger.error(f"Unexpected error in delivery worker: {e}")
+                time.sleep(5)
+
+    async def _create_session(self):
+        return ClientSession(timeout=ClientTimeout(total=self.timeout), trace_configs=[aiohttp_trace_config()])
+
+    def on_message(self, connection, ch, method, properties, body):
+        try:
+            job = json.loads(body)
+        except Exception as e:
+            logger.error(f"Failed to process delivery job: {e}")
+            self.dead_letter(ch, body.decode("utf-8", "replace"), {"job": str(e)})
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        future = asyncio.run_coroutine_threadsafe(
+            deliver(self.session, job, self.channels, self.max_attempts, self.backoff), self.loop)
+        future.add_done_callback(lambda f: self._finish_threadsafe(connection, ch, method.delivery_tag, job, f))
+
+    def _finish_threadsafe(self, connection, ch, delivery_tag, job, future):
+        try:
+            connection.add_callback_threadsafe(partial(self._finish, ch, delivery_tag, job, future))
+        except Exception as e:
+            # The connection is gone, the broker redelivers the job
+            logger.error(f"Cannot ack delivery job, it will be redelivered: {e}")
+
+    def _finish(self, ch, delivery_tag, job, future):
+        if not ch.is_open:
+            logger.error("Channel closed before the delivery job was acked, it will be redelivered")
+            return
+        try:
+            failed = future.result()
+            if failed:
+                logger.error(f"Delivery failed for channels {list(failed)}, moving job to {DEAD_LETTER_QUEUE}")
+                # Only the failed channels need to be replayed
+                self.dead_letter(ch, dict(job, channels=list(failed)), failed)
+        except Exception as e:
+            logger.error(f"Failed to process delivery job: {e}")
+            self.dead_letter(ch, job, {"job": str(e)})
+        ch.basic_ack(delivery_tag=delivery_tag)
+
+    def dead_letter(self, ch, job, errors):
+        ch.basic_publish(
+            exchange='',
+            routing_key=DEAD_LETTER_QUEUE,
+            body=json.dumps({"job": job, "errors": errors, "failed_at": time.time()}),
+            properties=pika.BasicProperties(delivery_mode=2))
+
+
+def start_delivery_workers(rabbitmq_url, channels, workers=2, **kwargs):
+    for _ in range(workers):
+        worker = DeliveryWorker(rabbitmq_url, channels, **kwargs)
+        threading.Thread(target=worker.run, name="delivery-worker", daemon=True).start()
@@ -0,0 +1,179 @@
+import asyncio
+import datetime
+import logging
+import threading
+import time
+
+from aiohttp import ClientSession
+
+from instrumentation import aiohttp_trace_config
+
+logger = logging.getLogger(__name__)
+
+
+def preference_key(preferences, valid_categories, max_categories=5):
+    """Category set a user's digest depends on, users with the same key get the same digest."""
+    valid = [category for category in (preferences or []) if category in valid_categories][:max_categories]
+    return tuple(sorted(set(valid)))
+
+
+class DigestJob:
+    """One pass of the bulk digest over every user.
+
+    Users are read page by page (the next page is fetched while the current one is
+    processed) and grouped by their category set. build_digest(categories) runs once
+    per distinct set for the whole run, then publish(user, digest) fans the result
+    out to every user of the group.
+
+    fetch_page(after_id, limit) returns (users, next_after_id), next_after_id is None
+    on the last page. Users are dicts with id, username, email and preferences.
+    """
+
+    def __init__(self, fetch_page, build_digest, publish, valid_categories, page_size=1000, max_categories=5):
+        self.fetch_page = fetch_page
+        self.build_digest = build_digest
+        self.publish = publish
+        self.valid_categories = set(valid_categories)
+        self.page_size = page_size
+        self.max_categories = max_categories
+        self.users = 0
+        self.pages = 0
+        self.skipped = 0
+        self.published = 0
+        self.failed = 0
+        self.started_at = None
+        self.wall_time = 0.0
+        self._digests = {}
+
+    async def run(self):
+        self.started_at = time.time()
+        start = time.perf_counter()
+        next_page = asyncio.ensure_future(self.fetch_page(None, self.page_size))
+        while next_page is not None:
+            users, after_id = await next_page
+            next_page = asyncio.ensure_future(self.fetch_page(after_id, self.page_size)) if after_id is not None else None
+            self.pages += 1
+            await self._process_page(users)
+            self.wall_time = time.perf_counter() - start
+        self.wall_time = time.perf_counter() - start
+        report = self.report()
+        logger.info(f"Digest finished: {report}")
+        return report
+
+    async def _process_page(self, users):
+        groups = {}
+        for user in users:
+            key = preference_key(user.get("preferences"), self.valid_categories, self.max_categories)
+            if key:
+                groups.setdefault(key, []).append(user)
+            else:
+                self.skipped += 1
+        self.users += len(users)
+
+        # Only category sets not seen on an earlier page are computed
+        new_keys = [key for key in groups if key not in self._digests]
+        results = await asyncio.gather(*(self.build_digest(list(key)) for key in new_keys), return_exceptions=True)
+        for key, result in zip(new_keys, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to build digest for {key}: {result}")
+                result = None
+            self._digests[key] = result
+
+        publishes = []
+        for key, group in groups.items():
+            digest = self._digests[key]
+            if not digest:
+                self.failed += len(group)
+                continue
+            publishes.extend(self.publish(user, digest) for user in group)
+        for result in await asyncio.gather(*publishes, return_exceptions=True):
+            if isinstance(result, BaseException):
+                self.failed += 1
+            else:
+                self.published += 1
+
+    def report(self):
+        return {
+            "users": self.users,
+            "pages": self.pages,
+            "distinct_preference_sets": len(self._digests),
+            "skipped": self.skipped,
+            "published": self.published,
+            "failed": self.failed,
+            "started_at": self.started_at,
+            "wall_time_s": round(self.wall_time, 3),
+            "users_per_s": round(self.users / self.wall_time, 1) if self.wall_time else 0.0,
+        }
+
+
+class DigestRunner:
+    """Runs digest jobs on a background thread, one at a time.
+
+    create_job(session) returns a new DigestJob using the given HTTP session.
+    trigger() starts a run now, with daily_at ("HH:MM", UTC) a run is also started
+    every day at that time. status() returns the progress of the current run or the
+    report of the last one.
+    """
+
+    def __init__(self, create_job, daily_at=None):
+        self.create_job = create_job
+        self.daily_at = daily_at
+        self.job = None
+        self.last_report = None
+        self.last_error = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._schedule_thread = None
+
+    def trigger(self):
+        """Start a run, returns False if one is already running."""
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+        threading.Thread(target=self._run, name="news-digest", daemon=True).start()
+        return True
+
+    def _run(self):
+        try:
+            self.last_report = asyncio.run(self._run_job())
+            self.last_error = None
+        except Exception as e:
+            logger.error(f"Digest run failed: {e}")
+            self.last_error = str(e)
+        finally:
+            with self._lock:
+                self._running = False
+
+    async def _run_job(self):
+        async with ClientSession(trace_configs=[aiohttp_trace_config()]) as session:
+            self.job = self.create_job(session)
+            return await self.job.run()
+
+    def status(self):
+        with self._lock:
+            running = self._running
+        return {
+            "running": running,
+            "current": self.job.report() if running and self.job is not None else None,
+            "last_report": self.last_report,
+            "last_error": self.last_error,
+            "daily_at": self.daily_at,
+        }
+
+    def start_schedule(self):
+        if not self.daily_at or self._schedule_thread is not None:
+            return
+        self._schedule_thread = threading.Thread(target=self._schedule, name="news-digest-schedule", daemon=True)
+        self._schedule_thread.start()
+
+    def _schedule(self):
+        hour, minute = (int(part) for part in self.daily_at.split(":"))
+        while True:
+            now = datetime.datetime.utcnow()
+            next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if next_run <= now:
+                next_run += datetime.timedelta(days=1)
+            time.sleep((next_run - now).total_seconds())
+            if not self.trigger():
+                logger.warning("Scheduled digest skipped, the previous run is still going")
@@ -0,0 +1,39 @@
+import asyncio
+import contextvars
+import json
+
+# Sent while nothing else is, so proxies do not close an idle stream
+KEEPALIVE = ": keepalive\n\n"
+
+
+def sse_event(event, data):
+    """One Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def iterate_async(agen, context=None):
+    """Run an async generator from a sync generator, on an event loop of its own.
+
+    Flask only streams sync generators, so each item is produced by running the loop
+    until the async generator yields it. The request has ended by the time the stream
+    is written, `context` (contextvars.copy_context() taken in the view) keeps its
+    trace. When the client goes away the WSGI server closes this generator, which
+    closes the async one (cancelling what only it waits for) too.
+    """
+    if context is None:
+        context = contextvars.copy_context()
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield context.run(loop.run_until_complete, agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        context.run(loop.run_until_complete, agen.aclose())
+        # Work the generator left to others (e.g. a shared fetch) finishes before the loop closes
+        remaining = asyncio.all_tasks(loop)
+        if remaining:
+            loop.run_until_complete(asyncio.gather(*remaining, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
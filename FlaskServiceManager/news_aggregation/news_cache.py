@@ -0,0 +1,252 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Interface for the news cache. Entries are dicts of {"data": ..., "timestamp": ...}."""
+
+    @abstractmethod
+    def get(self, key):
+        pass
+
+    @abstractmethod
+    def set(self, key, entry):
+        pass
+
+    @abstractmethod
+    def items(self):
+        pass
+
+    def load(self):
+        """Called once at startup."""
+
+    def close(self):
+        """Called on shutdown."""
+
+
+class MemoryCache(CacheBackend):
+    """Thread-safe in-memory tier with LRU eviction and a TTL on entries."""
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry["timestamp"] >= self.ttl
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.time()):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def items(self):
+        with self._lock:
+            now = time.time()
+            return [(key, entry) for key, entry in self._entries.items() if not self._expired(entry, now)]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteWriteBehindStore:
+    """Persistence tier that writes to SQLite from a background thread.
+
+    set() only records the entry as dirty, the flush thread writes all dirty
+    entries in one transaction every flush_interval seconds. Several writes to the
+    same key between flushes are coalesced into one row update.
+    """
+
+    def __init__(self, path, flush_interval=5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS news_cache ("
+            "key TEXT PRIMARY KEY, data TEXT NOT NULL, timestamp REAL NOT NULL)"
+        )
+        return connection
+
+    def load(self):
+        connection = self._connect()
+        try:
+            rows = connection.execute("SELECT key, data, timestamp FROM news_cache").fetchall()
+        finally:
+            connection.close()
+        return {key: {"data": json.loads(data), "timestamp": timestamp} for key, data, timestamp in rows}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="news-cache-writer", daemon=True)
+            self._thread.start()
+
+    def set(self, key, entry):
+        with self._lock:
+            self._dirty[key] = entry
+
+    def _run(self):
+        connection = self._connect()
+        try:
+            while not self._stop.wait(self.flush_interval):
+                self._flush(connection)
+            self._flush(connection)
+        finally:
+            connection.close()
+
+    def _flush(self, connection):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO news_cache (key, data, timestamp) VALUES (?, ?, ?)",
+                    [(key, json.dumps(entry["data"]), entry["timestamp"]) for key, entry in dirty.items()],
+                )
+            logger.info(f"Cache flushed to {self.path} ({len(dirty)} entries)")
+        except Exception as e:
+            logger.error(f"Failed to flush cache: {e}")
+            # Keep the entries for the next flush unless they were updated meanwhile
+            with self._lock:
+                for key, entry in dirty.items():
+                    self._dirty.setdefault(key, entry)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class TieredCache(CacheBackend):
+    """Memory tier in front of a write-behind persistent store."""
+
+    def __init__(self, memory, store):
+        self.memory = memory
+        self.store = store
+
+    def get(self, key):
+        return self.memory.get(key)
+
+    def set(self, key, entry):
+        self.memory.set(key, entry)
+        self.store.set(key, entry)
+
+    def items(self):
+        return self.memory.items()
+
+    def load(self, legacy_pickle_path=None):
+        entries = self.store.load()
+        if not entries and legacy_pickle_path and os.path.exists(legacy_pickle_path):
+            # One-time import of the old pickle cache file
+            with open(legacy_pickle_path, "rb") as cache_file:
+                entries = pickle.load(cache_file)
+            for key, entry in entries.items():
+                self.store.set(key, entry)
+            logger.info(f"Imported {len(entries)} entries from {legacy_pickle_path}")
+        for key, entry in entries.items():
+            self.memory.set(key, entry)
+        self.store.start()
+        logger.info(f"Cache loaded with {len(self.memory)} entries")
+
+    def close(self):
+        self.store.close()
+
+
+def normalize_url(url):
+    """Normalize an article link so the same article maps to one key.
+
+    Scheme and host are lowercased, the fragment, tracking parameters and a trailing
+    slash are dropped and the remaining query parameters are sorted.
+    """
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in ("fbclid", "gclid")
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+def link_key(link):
+    """Stable key for an article: a hash of its normalized link."""
+    return hashlib.sha256(normalize_url(link).encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """Summaries keyed by a hash of the normalized article link.
+
+    Keeps hit/miss counters and the average time of a summary call, so stats()
+    can report how many LLM calls and how much latency the cache saved.
+    """
+
+    def __init__(self, max_entries=10000, ttl=None):
+        self.memory = MemoryCache(max_entries=max_entries, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self._generated = 0
+        self._generate_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, link):
+        entry = self.memory.get(link_key(link))
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry["data"]
+
+    def set(self, link, summary, generate_seconds=None):
+        self.memory.set(link_key(link), {"data": summary, "timestamp": time.time()})
+        if generate_seconds is not None:
+            with self._lock:
+                self._generated += 1
+                self._generate_seconds += generate_seconds
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            average = self._generate_seconds / self._generated if self._generated else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self.memory),
+                "llm_calls_saved": self.hits,
+                "avg_summary_seconds": round(average, 4),
+                "estimated_seconds_saved": round(self.hits * average, 2),
+            }
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import random
+import threading
+
+from aiohttp import ClientSession
+
+from instrumentation import aiohttp_trace_config
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchScheduler:
+    """Keeps categories warm by refreshing them from a background event loop.
+
+    Every interval (with random jitter so replicas do not refresh in lockstep) the
+    scheduler refreshes the categories for which is_due(category) is true, running at
+    most `concurrency` refreshes at once. revalidate() lets request handlers queue a
+    refresh for a stale entry they are serving.
+    """
+
+    def __init__(self, categories, is_due, refresh, interval, jitter=0.1, concurrency=4):
+        self.categories = list(categories)
+        self.is_due = is_due
+        self.refresh = refresh
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.refreshes = 0
+        self.failures = 0
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._semaphore = None
+        self._stop = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="news-prefetch", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join()
+
+    def revalidate(self, category):
+        """Queue a background refresh, returns False when the scheduler is not running."""
+        if self._loop is None or not self._loop.is_running():
+            return False
+        with self._lock:
+            if category in self._pending:
+                return True
+            self._pending.add(category)
+        asyncio.run_coroutine_threadsafe(self._refresh(category), self._loop)
+        return True
+
+    def _run_loop(self, ready):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._stop = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._loop.call_soon(ready.set)
+        try:
+            self._loop.run_until_complete(self._run())
+        finally:
+            self._loop.close()
+            self._loop = None
+
+    async def _run(self):
+        async with ClientSession(trace_configs=[aiohttp_trace_config()]) as session:
+            self._session = session
+            while not self._stop.is_set():
+                await self.run_once()
+                delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_once(self):
+        due = [category for category in self.categories if self.is_due(category)]
+        if due:
+            logger.info(f"Prefetching categories: {due}")
+        with self._lock:
+            self._pending.update(due)
+        await asyncio.gather(*(self._refresh(category) for category in due))
+
+    async def _refresh(self, category):
+        try:
+            async with self._semaphore:
+                result = await self.refresh(self._session, category)
+            if result is None:
+                self.failures += 1
+            else:
+                self.refreshes += 1
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Prefetch failed for category {category}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(category)
+
+    def stats(self):
+        return {
+            "running": self._loop is not None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class LeaderCancelled(Exception):
+    """The call was cancelled before it finished (its event loop shut down)."""
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls for the same key.
+
+    The first caller for a key starts the call as a task of its own, every caller
+    (the first one included) awaits the shared result through asyncio.shield, so a
+    caller that is cancelled (e.g. a client that disconnected) only stops waiting and
+    the call goes on for the others. Flask runs every async view in its own event
+    loop, so the shared result is a thread-safe concurrent Future rather than an
+    asyncio one. If the call itself is cancelled, because the loop running it shut
+    down, the waiters start it again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        # Running calls, referenced here so they are not garbage collected
+        self._tasks = set()
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, func):
+        while True:
+            with self._lock:
+                future = self._in_flight.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    self._in_flight[key] = future
+                    self.calls += 1
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                task = asyncio.ensure_future(self._run(key, func, future))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            try:
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except LeaderCancelled:
+                continue
+
+    async def _run(self, key, func, future):
+        # The key is released before the result is set, so a waiter that retries
+        # after a cancellation starts a new call instead of joining this one
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            self._release(key)
+            future.set_exception(LeaderCancelled(f"call for {key} was cancelled"))
+            raise
+        except Exception as e:
+            self._release(key)
+            future.set_exception(e)
+        else:
+            self._release(key)
+            future.set_result(result)
+
+    def _release(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    async def wait(self):
+        """Wait for the calls started on this event loop, before closing what they use."""
+        loop = asyncio.get_running_loop()
+        tasks = [task for task in list(self._tasks) if task.get_loop() is loop]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        with self._lock:
+            total = self.calls + self.coalesced
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+                "coalescing_hit_rate": round(self.coalesced / total, 4) if total else 0.0,
+            }
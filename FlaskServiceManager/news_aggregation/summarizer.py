@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import time_upstream
+
+
+class TokenBucket:
+    """Thread-safe token bucket, acquire() blocks until a token is available."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class Summarizer:
+    """Runs the blocking Gemini client on a bounded thread pool.
+
+    The model instance is created once and shared. At most max_workers calls are in
+    flight, they are started no faster than rate_per_minute (the API quota) and each
+    call is cut off after timeout seconds.
+    """
+
+    def __init__(self, model, max_workers=8, rate_per_minute=60, burst=None, timeout=30.0):
+        self.model = model
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summarizer")
+        self.limiter = TokenBucket(rate_per_minute / 60.0, burst or max_workers)
+
+    def _generate(self, prompt):
+        self.limiter.acquire()
+        with time_upstream("gemini", "generate_content"):
+            return self.model.generate_content(prompt, request_options={"timeout": self.timeout})
+
+    async def generate(self, prompt):
+        # run_in_executor keeps the event loop free, so gathered summaries really overlap
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._generate, prompt)
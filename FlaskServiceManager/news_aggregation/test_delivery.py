@@ -0,0 +1,68 @@
+import asyncio
+import json
+from concurrent.futures import Future
+
+from aiohttp import ClientSession, web
+
+from delivery import DEAD_LETTER_QUEUE, DeliveryWorker, deliver
+
+
+class FakeChannel:
+    is_open = True
+
+    def __init__(self):
+        self.published = []
+        self.acked = []
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published.append((routing_key, json.loads(body)))
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+
+def test_failed_email_is_retried_and_dead_lettered():
+    calls = {"email": 0, "telegram": 0}
+
+    async def email(request):
+        calls["email"] += 1
+        # What email_bot answers when the SMTP send fails
+        return web.json_response({"status": "error", "message": "Failed to send email"}, status=502)
+
+    async def telegram(request):
+        calls["telegram"] += 1
+        return web.json_response({"status": "success"})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post("/send_email", email)
+        app.router.add_post("/receive_data", telegram)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        channels = {"telegram": f"http://127.0.0.1:{port}/receive_data",
+                    "email": f"http://127.0.0.1:{port}/send_email"}
+        try:
+            async with ClientSession() as session:
+                job = {"news": [], "username": "alice", "email": "alice@example.com"}
+                return job, channels, await deliver(session, job, channels, max_attempts=3, backoff=0)
+        finally:
+            await runner.cleanup()
+
+    job, channels, failed = asyncio.run(scenario())
+    assert list(failed) == ["email"]
+    assert calls == {"email": 3, "telegram": 1}
+
+    future = Future()
+    future.set_result(failed)
+    ch = FakeChannel()
+    DeliveryWorker("amqp://", channels)._finish(ch, 7, job, future)
+
+    queue, message = ch.published[0]
+    assert queue == DEAD_LETTER_QUEUE
+    # Only the failed channel is replayed
+    assert message["job"]["channels"] == ["email"]
+    assert "502" in message["errors"]["email"]
+    assert ch.acked == [7]
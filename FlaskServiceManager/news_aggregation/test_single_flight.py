@@ -0,0 +1,53 @@
+import asyncio
+
+from single_flight import SingleFlight
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "articles"
+
+        leader = asyncio.ensure_future(flight.do("top", fetch))
+        follower = asyncio.ensure_future(flight.do("top", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        assert await follower == "articles"
+        assert leader.cancelled()
+        assert len(calls) == 1
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_call_cancelled_with_its_loop_is_started_again():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def fetch():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fetch_again():
+            return "articles"
+
+        leader = asyncio.ensure_future(flight.do("top", fetch))
+        await started.wait()
+        follower = asyncio.ensure_future(flight.do("top", fetch_again))
+        await asyncio.sleep(0)
+        # The leader and its call are cancelled together, as when the leader's loop shuts down
+        leader.cancel()
+        for task in list(flight._tasks):
+            task.cancel()
+
+        assert await follower == "articles"
+        assert leader.cancelled()
+
+    asyncio.run(scenario())
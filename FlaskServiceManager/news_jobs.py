@@ -0,0 +1,137 @@
+import time
+import uuid
+from collections import OrderedDict
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class NewsJob:
+    """One news request: fetch, summarize and hand the articles over for delivery."""
+
+    __slots__ = ("id", "user_id", "key", "status", "created_at", "finished_at", "articles", "error")
+
+    def __init__(self, user_id, key):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.key = key
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.finished_at = None
+        self.articles = None
+        self.error = None
+
+    def start(self):
+        self.status = RUNNING
+
+    def finish(self, articles=None):
+        self.status = DONE
+        self.articles = articles
+        self.finished_at = time.time()
+
+    def fail(self, error):
+        self.status = FAILED
+        self.error = error[:200]
+        self.finished_at = time.time()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "articles": self.articles,
+            "error": self.error,
+        }
+
+
+class NewsJobStore:
+    """News jobs by id, so repeated requests reuse the job already running for them.
+
+    A request is keyed by user and categories. submit() returns the latest job of the
+    key while it is queued or running, or finished successfully less than
+    `dedup_window` seconds ago (however long it ran); otherwise (or after a failure) it creates a new one.
+    Finished jobs are kept for `ttl` seconds after they finished for status lookups,
+    expired in completion order, and the oldest jobs are dropped past `max_entries`.
+    Jobs are finished through finish()/fail() here so the store sees it. Runs on the
+    manager's event loop only, so no locking is needed.
+    """
+
+    def __init__(self, dedup_window=60, ttl=3600, max_entries=100000):
+        self.dedup_window = dedup_window
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.created = 0
+        self.deduplicated = 0
+        self._jobs = OrderedDict()
+        # Job id -> finish time, in completion order
+        self._finished = OrderedDict()
+        self._latest = {}
+
+    @staticmethod
+    def request_key(user_id, preferences):
+        return user_id, tuple(sorted(set(preferences)))
+
+    def submit(self, user_id, preferences):
+        """Return (job, created) for a news request."""
+        self._expire()
+        key = self.request_key(user_id, preferences)
+        job = self._jobs.get(self._latest.get(key))
+        if job is not None and self._reusable(job):
+            self.deduplicated += 1
+            return job, False
+
+        job = NewsJob(user_id, key)
+        self._jobs[job.id] = job
+        self._latest[key] = job.id
+        self.created += 1
+        while len(self._jobs) > self.max_entries:
+            self._remove(next(iter(self._jobs)))
+        return job, True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def finish(self, job, articles=None):
+        job.finish(articles)
+        self._finished[job.id] = job.finished_at
+
+    def fail(self, job, error):
+        job.fail(error)
+        self._finished[job.id] = job.finished_at
+
+    def discard(self, job):
+        """Forget a job that was never queued (e.g. the queue was full)."""
+        self._remove(job.id)
+        self.created -= 1
+
+    def _reusable(self, job):
+        if job.status in (QUEUED, RUNNING):
+            return True
+        return job.status == DONE and time.time() - job.finished_at < self.dedup_window
+
+    def _expire(self):
+        # Finished jobs are in completion order, a long running job does not hold them back
+        now = time.time()
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if now - finished_at < self.ttl:
+                break
+            self._remove(job_id)
+
+    def _remove(self, job_id):
+        self._finished.pop(job_id, None)
+        job = self._jobs.pop(job_id, None)
+        if job is not None and self._latest.get(job.key) == job_id:
+            del self._latest[job.key]
+
+    def stats(self):
+        return {
+            "created": self.created,
+            "deduplicated": self.deduplicated,
+            "active": len(self._jobs) - len(self._finished),
+            "entries": len(self._jobs),
+            "dedup_window_seconds": self.dedup_window,
+        }
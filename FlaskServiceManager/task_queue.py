@@ -0,0 +1,78 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TaskQueue:
+    """Bounded queue of background jobs run by a fixed number of worker tasks.
+
+    submit() never waits: it raises asyncio.QueueFull when `maxsize` jobs are already
+    waiting, so the caller can reject the request (429) instead of piling up work.
+    Jobs are coroutine functions called with their arguments, a failed job is logged
+    and counted. Runs on the app's event loop, start() and stop() are called from the
+    lifespan.
+    """
+
+    def __init__(self, name: str, workers: int = 16, maxsize: int = 1000):
+        self.name = name
+        self.workers = workers
+        self.maxsize = maxsize
+        self.accepted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.running = 0
+        self._queue = None
+        self._tasks = []
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10):
+        """Let queued jobs finish for up to `timeout` seconds, then cancel the workers."""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.name}: {self._queue.qsize() + self.running} jobs dropped on shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job, *args):
+        try:
+            self._queue.put_nowait((job, args))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        self.accepted += 1
+
+    async def _worker(self):
+        while True:
+            job, args = await self._queue.get()
+            self.running += 1
+            try:
+                await job(*args)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"{self.name}: job failed: {str(e)}")
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running,
+            "workers": self.workers,
+            "maxsize": self.maxsize,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
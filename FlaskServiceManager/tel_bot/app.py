@@ -1,21 +1,49 @@
 import os
-import requests
 from flask import Flask, request, jsonify
 from dotenv import load_dotenv
 import json
+import logging
+from telegram_sender import TelegramSender
+from instrumentation import instrument_flask
+from structured_logging import configure_logging, log_payload
 # Load environment variables from .env file
 load_dotenv()
 
+# JSON logs written by a background thread, levels from LOG_LEVEL / LOG_LEVELS
+configure_logging("tel_bot")
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
+# Route latency, in-flight requests and trace context, served on /metrics
+instrument_flask(app)
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 YOUR_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+# Point this at mock_telegram_api.py for local testing
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))  # messages per second for the bot
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", 1))  # messages per second per chat
+TELEGRAM_SENDER_WORKERS = int(os.getenv("TELEGRAM_SENDER_WORKERS", 4))
+TELEGRAM_MAX_QUEUED = int(os.getenv("TELEGRAM_MAX_QUEUED", 10000))
+# Sends per message on 5xx or connection errors, the first retry waits TELEGRAM_BACKOFF seconds
+TELEGRAM_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_MAX_ATTEMPTS", 4))
+TELEGRAM_BACKOFF = float(os.getenv("TELEGRAM_BACKOFF", 1))
+
+sender = TelegramSender(
+    TELEGRAM_TOKEN,
+    api_url=TELEGRAM_API_URL,
+    global_rate=TELEGRAM_GLOBAL_RATE,
+    chat_rate=TELEGRAM_CHAT_RATE,
+    workers=TELEGRAM_SENDER_WORKERS,
+    max_queued=TELEGRAM_MAX_QUEUED,
+    max_attempts=TELEGRAM_MAX_ATTEMPTS,
+    backoff=TELEGRAM_BACKOFF,
+)
 
 
-def send_telegram_message(message):
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage?chat_id={YOUR_CHAT_ID}&text={message}"
-    response = requests.post(url)
-    return response.json()
+def send_telegram_message(message, chat_id=None):
+    """Queue the message for the sender, returns the number of chunks after splitting."""
+    return sender.send(chat_id or YOUR_CHAT_ID, message)
 
 
 @app.route("/receive_data", methods=["POST"])
@@ -46,14 +74,20 @@ def receive_data():
         )
 
     message = "\n\n".join(message_parts)
-    print(message)
+    log_payload(logger, logging.DEBUG, "Telegram message", message)
 
-    # Send the received data to your Telegram bot
-    send_telegram_message(f"Received news data:\n\n{message}")
+    # Queue the received data for your Telegram bot, the sender smooths bursts
+    chunks = send_telegram_message(f"Received news data:\n\n{message}")
 
     # Respond with a success message
     return jsonify(
-        {"status": "success", "message": "News data received and sent to Telegram successfully", "received_data": data})
+        {"status": "success", "message": "News data received and queued for Telegram", "chunks": chunks,
+         "received_data": data})
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify(sender.stats())
 
 
 if __name__ == "__main__":
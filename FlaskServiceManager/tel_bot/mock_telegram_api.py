@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from flask import Flask, request, jsonify
+
+# Local stand-in for the Telegram Bot API, point TELEGRAM_API_URL at it for tests.
+# It enforces the same limits as Telegram (4096 characters, ~30 messages/s per bot,
+# ~1 message/s per chat) and answers with 429 and retry_after when they are exceeded.
+
+app = Flask(__name__)
+
+GLOBAL_LIMIT = int(os.getenv("MOCK_TELEGRAM_GLOBAL_LIMIT", 30))  # messages per second
+CHAT_LIMIT = int(os.getenv("MOCK_TELEGRAM_CHAT_LIMIT", 1))  # messages per second per chat
+CHAT_BURST = int(os.getenv("MOCK_TELEGRAM_CHAT_BURST", 3))  # short bursts Telegram tolerates
+MAX_MESSAGE_LENGTH = 4096
+
+messages = []
+rejected = {"too_long": 0, "flood": 0}
+_global_sends = deque()
+_chat_sends = defaultdict(deque)
+_lock = threading.Lock()
+
+
+def _over_limit(sends, limit, now):
+    while sends and now - sends[0] >= 1.0:
+        sends.popleft()
+    return len(sends) >= limit
+
+
+@app.route("/bot<token>/sendMessage", methods=["POST"])
+def send_message(token):
+    data = request.get_json(silent=True) or request.form or request.args
+    chat_id = str(data.get("chat_id"))
+    text = data.get("text") or ""
+
+    if len(text) > MAX_MESSAGE_LENGTH:
+        with _lock:
+            rejected["too_long"] += 1
+        return jsonify({"ok": False, "error_code": 400, "description": "Bad Request: message is too long"}), 400
+
+    with _lock:
+        now = time.monotonic()
+        if _over_limit(_global_sends, GLOBAL_LIMIT, now) or _over_limit(_chat_sends[chat_id], CHAT_LIMIT * CHAT_BURST, now):
+            rejected["flood"] += 1
+            return jsonify({"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                            "parameters": {"retry_after": 1}}), 429
+        _global_sends.append(now)
+        _chat_sends[chat_id].append(now)
+        messages.append({"chat_id": chat_id, "text": text, "time": time.time()})
+        message_id = len(messages)
+
+    return jsonify({"ok": True, "result": {"message_id": message_id, "chat": {"id": chat_id}, "text": text}})
+
+
+@app.route("/messages", methods=["GET"])
+def list_messages():
+    with _lock:
+        return jsonify({"messages": list(messages), "rejected": dict(rejected)})
+
+
+@app.route("/messages", methods=["DELETE"])
+def clear_messages():
+    with _lock:
+        messages.clear()
+        rejected.update(too_long=0, flood=0)
+        _global_sends.clear()
+        _chat_sends.clear()
+    return jsonify({"ok": True})
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.getenv("MOCK_TELEGRAM_PORT", 8081)))
@@ -0,0 +1,237 @@
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+import requests
+
+from instrumentation import time_upstream
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+
+def split_message(text, limit=MAX_MESSAGE_LENGTH):
+    """Split text into chunks of at most `limit` characters.
+
+    Splits on paragraph breaks first, then on line breaks and only cuts inside a
+    line when a single line is longer than the limit.
+    """
+    if len(text) <= limit:
+        return [text]
+
+    chunks = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        pieces = [paragraph]
+        if len(paragraph) > limit:
+            pieces = []
+            for line in paragraph.split("\n"):
+                while len(line) > limit:
+                    pieces.append(line[:limit])
+                    line = line[limit:]
+                pieces.append(line)
+        for i, piece in enumerate(pieces):
+            separator = "\n\n" if i == 0 else "\n"
+            if current and len(current) + len(separator) + len(piece) <= limit:
+                current += separator + piece
+            else:
+                if current:
+                    chunks.append(current)
+                current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, now):
+        """Seconds until a token is available (0 if one is available now)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class TelegramSender:
+    """Queues messages per chat and sends them within Telegram's rate limits.
+
+    A global token bucket and one bucket per chat keep the send rate under the
+    flood limits, so bursts wait in the queue instead of being rejected. Queued
+    messages for the same chat are coalesced up to the 4096 character cap and
+    longer texts are split. A 429 response pauses the chat for its retry_after
+    and the message is sent again, transient errors (5xx, connection errors) pause
+    it with jittered exponential backoff for up to max_attempts sends. Sends go
+    through one persistent HTTP session from a few worker threads, with at most one
+    in-flight send per chat to keep the order. The rate state of chats with nothing
+    queued is dropped every prune_interval seconds once it equals a fresh chat's.
+    """
+
+    def __init__(self, token, api_url="https://api.telegram.org", global_rate=30.0, chat_rate=1.0,
+                 workers=4, max_queued=10000, timeout=10.0, max_attempts=4, backoff=1.0, prune_interval=60.0):
+        self.url = f"{api_url}/bot{token}/sendMessage"
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.prune_interval = prune_interval
+        self.session = requests.Session()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+        self._chats = OrderedDict()  # chat_id -> deque of pending texts
+        self._chat_buckets = {}
+        self._paused_until = {}
+        self._attempts = {}  # chat_id -> failed sends of the message at the front
+        self._pruned_at = time.monotonic()
+        self._busy = set()
+        self._queued = 0
+        self._cond = threading.Condition()
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f"telegram-sender-{i}", daemon=True).start()
+
+    def send(self, chat_id, text):
+        """Queue a message, blocks only when max_queued messages are already waiting."""
+        chunks = split_message(text)
+        with self._cond:
+            while self._queued + len(chunks) > self.max_queued:
+                self._cond.wait()
+            self._chats.setdefault(chat_id, deque()).extend(chunks)
+            self._queued += len(chunks)
+            self._cond.notify_all()
+        return len(chunks)
+
+    def flush(self, timeout=None):
+        """Wait until every queued message was sent, returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queued or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._cond:
+            return {"queued": self._queued, "sent": self.sent, "retried": self.retried, "failed": self.failed,
+                    "chats": len(self._chat_buckets)}
+
+    def _prune_idle(self, now):
+        """Forget the rate state of chats with nothing queued, when it equals a fresh chat's."""
+        for chat_id in [chat_id for chat_id, until in self._paused_until.items() if until <= now]:
+            del self._paused_until[chat_id]
+        for chat_id, bucket in list(self._chat_buckets.items()):
+            if chat_id in self._chats or chat_id in self._busy or chat_id in self._paused_until:
+                continue
+            if bucket.wait_time(now) == 0 and bucket.tokens >= bucket.capacity:
+                del self._chat_buckets[chat_id]
+
+    def _next_message(self, now):
+        """Pick a chat that may send now.
+
+        Returns (chat_id, text, chunk_count), or (None, seconds to wait, 0) when no chat may send.
+        """
+        if now - self._pruned_at >= self.prune_interval:
+            self._prune_idle(now)
+            self._pruned_at = now
+        wait = 1.0
+        global_wait = self.global_bucket.wait_time(now)
+        for chat_id, pending in self._chats.items():
+            if chat_id in self._busy:
+                continue
+            paused = self._paused_until.get(chat_id, 0) - now
+            bucket = self._chat_buckets.setdefault(chat_id, TokenBucket(self.chat_rate, 1))
+            chat_wait = max(paused, bucket.wait_time(now), global_wait)
+            if chat_wait > 0:
+                wait = min(wait, chat_wait)
+                continue
+
+            # Coalesce queued messages of this chat into one, up to the length cap
+            text = pending.popleft()
+            count = 1
+            while pending and len(text) + 2 + len(pending[0]) <= MAX_MESSAGE_LENGTH:
+                text += "\n\n" + pending.popleft()
+                count += 1
+            if not pending:
+                del self._chats[chat_id]
+            else:
+                # Round-robin: let the other chats go first next time
+                self._chats.move_to_end(chat_id)
+            self.global_bucket.take()
+            bucket.take()
+            self._busy.add(chat_id)
+            return chat_id, text, count
+        return None, wait, 0
+
+    def _run(self):
+        while True:
+            with self._cond:
+                chat_id, text, count = self._next_message(time.monotonic())
+                while chat_id is None:
+                    self._cond.wait(text)
+                    chat_id, text, count = self._next_message(time.monotonic())
+
+            sent, retry_after, transient = self._post(chat_id, text)
+
+            with self._cond:
+                self._busy.discard(chat_id)
+                if transient:
+                    attempt = self._attempts.get(chat_id, 0) + 1
+                    if attempt < self.max_attempts:
+                        self._attempts[chat_id] = attempt
+                        retry_after = self.backoff * 2 ** (attempt - 1) * random.uniform(0.8, 1.2)
+                        logger.warning(f"Retrying Telegram message to chat {chat_id} in {retry_after:.1f}s "
+                                       f"(attempt {attempt}/{self.max_attempts})")
+                if retry_after is None:
+                    self._attempts.pop(chat_id, None)
+                    self._queued -= count
+                    if sent:
+                        self.sent += 1
+                    else:
+                        self.failed += 1
+                else:
+                    # Put the coalesced message back in front and pause the chat
+                    self.retried += 1
+                    self._queued -= count - 1
+                    self._paused_until[chat_id] = time.monotonic() + retry_after
+                    self._chats.setdefault(chat_id, deque()).appendleft(text)
+                    self._chats.move_to_end(chat_id, last=False)
+                self._cond.notify_all()
+
+    def _post(self, chat_id, text):
+        """Send one message, returns (sent, retry_after, transient).
+
+        retry_after is set on a 429, transient on a 5xx or connection error that may
+        succeed when sent again.
+        """
+        with time_upstream("telegram", "sendMessage") as timer:
+            try:
+                response = self.session.post(self.url, json={"chat_id": chat_id, "text": text}, timeout=self.timeout)
+                if response.status_code == 429:
+                    timer.outcome = "throttled"
+                    retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                    logger.warning(f"Telegram flood limit for chat {chat_id}, retrying in {retry_after}s")
+                    return False, retry_after, False
+                response.raise_for_status()
+                return True, None, False
+            except Exception as e:
+                timer.outcome = "error"
+                logger.error(f"Failed to send Telegram message to chat {chat_id}: {e}")
+                transient = isinstance(e, (requests.ConnectionError, requests.Timeout)) or (
+                    isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code >= 500)
+                return False, None, transient
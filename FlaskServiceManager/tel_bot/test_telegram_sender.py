@@ -0,0 +1,73 @@
+import time
+
+import requests
+
+from telegram_sender import TelegramSender
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def json(self):
+        return {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+
+class FakeSession:
+    def __init__(self, outcomes):
+        # chat_id -> statuses or exceptions of its sends, then 200
+        self.outcomes = {chat_id: list(chat_outcomes) for chat_id, chat_outcomes in outcomes.items()}
+        self.posts = []
+
+    def post(self, url, json, timeout):
+        self.posts.append(json)
+        pending = self.outcomes.get(json["chat_id"])
+        outcome = pending.pop(0) if pending else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+def make_sender(outcomes, **kwargs):
+    sender = TelegramSender("token", api_url="http://telegram.invalid", chat_rate=1000, workers=1,
+                            backoff=0.01, **kwargs)
+    sender.session = FakeSession(outcomes)
+    return sender
+
+
+def test_transient_errors_are_retried():
+    sender = make_sender({1: [502, requests.ConnectionError("reset")]})
+    sender.send(1, "hello")
+
+    assert sender.flush(timeout=5)
+    assert sender.stats()["sent"] == 1
+    assert sender.stats()["retried"] == 2
+    assert len(sender.session.posts) == 3
+
+
+def test_message_fails_after_max_attempts_or_on_a_client_error():
+    sender = make_sender({1: [503, 503, 503], 2: [400]}, max_attempts=3)
+    sender.send(1, "hello")
+    sender.send(2, "world")
+
+    assert sender.flush(timeout=5)
+    assert sender.stats()["failed"] == 2
+    assert len(sender.session.posts) == 4
+
+
+def test_idle_chats_are_pruned():
+    sender = make_sender({}, prune_interval=0)
+    for chat_id in range(20):
+        sender.send(chat_id, "hello")
+    assert sender.flush(timeout=5)
+
+    # Long enough for the buckets to fill up again
+    time.sleep(0.01)
+    sender.send(100, "again")
+    assert sender.flush(timeout=5)
+    # Only the chat that sent last can still be rate limited
+    assert sender.stats()["chats"] <= 1
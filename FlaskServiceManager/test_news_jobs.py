@@ -0,0 +1,40 @@
+import time
+
+from news_jobs import DONE, NewsJobStore
+
+
+def test_long_running_job_is_reused_right_after_it_finished(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    store = NewsJobStore(dedup_window=60, ttl=3600)
+
+    job, created = store.submit(1, ["top", "sports"])
+    job.start()
+    # Runs for longer than the dedup window
+    now[0] += 300
+    store.finish(job, 5)
+
+    now[0] += 10
+    again, created = store.submit(1, ["sports", "top"])
+    assert again is job and not created
+    assert again.status == DONE
+
+    now[0] += 60
+    later, created = store.submit(1, ["top", "sports"])
+    assert later is not job and created
+
+
+def test_finished_jobs_expire_behind_a_running_job(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    store = NewsJobStore(dedup_window=60, ttl=100)
+
+    running, _ = store.submit(1, ["top"])
+    running.start()
+    finished, _ = store.submit(2, ["top"])
+    store.finish(finished, 3)
+
+    now[0] += 101
+    store.submit(3, ["top"])
+    assert store.get(finished.id) is None
+    assert store.get(running.id) is running
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ARRAY
+from sqlalchemy import Column, Index, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY  # adds overlap() for the category filters
 from database import Base
 
 
@@ -10,3 +11,8 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     preferences = Column(ARRAY(String), default=[], nullable=True)
 
+    # GIN index for category filters on preferences (&& and @>)
+    __table_args__ = (
+        Index("ix_users_preferences_gin", preferences, postgresql_using="gin"),
+    )
+
@@ -0,0 +1,90 @@
+import bcrypt
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import os
+import secrets
+import threading
+
+# bcrypt work factor for new hashes, stored hashes with another cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes hashing and verifying passwords, shared by logins and the signup consumers
+PASSWORD_PROCESSES = int(os.getenv("PASSWORD_PROCESSES", os.getenv("SIGNUP_HASH_PROCESSES", str(os.cpu_count() or 1))))
+# Seconds a login waits for its verification before failing
+PASSWORD_VERIFY_TIMEOUT = float(os.getenv("PASSWORD_VERIFY_TIMEOUT", "10"))
+
+_pool = None
+_dummy_hash = None
+_lock = threading.Lock()
+
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def hash_rounds(hashed_password):
+    """Cost factor of a bcrypt hash ("$2b$12$..." -> 12)."""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def check_password(password, hashed_password, rounds=BCRYPT_ROUNDS):
+    """Verify a password, returns (valid, new_hash).
+
+    new_hash is set when the password is valid but the stored hash uses another cost
+    than `rounds`, so the caller can store the rehashed password.
+    """
+    if not bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8')):
+        return False, None
+    if hash_rounds(hashed_password) != rounds:
+        return True, hash_password(password, rounds)
+    return True, None
+
+
+def get_password_pool():
+    """Process pool for bcrypt so hashing runs on every core, off the request threads."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_PROCESSES)
+        return _pool
+
+
+def _discard_password_pool(pool):
+    """Drop a broken pool (a worker died), the next call starts a new one."""
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def dummy_hash():
+    """Hash of a random password at the current cost, checked for unknown usernames.
+
+    A failed login then costs the same time whether or not the username exists.
+    """
+    global _dummy_hash
+    with _lock:
+        if _dummy_hash is None:
+            _dummy_hash = hash_password(secrets.token_urlsafe(16))
+        return _dummy_hash
+
+
+def verify_password(password, hashed_password=None, timeout=PASSWORD_VERIFY_TIMEOUT):
+    """Verify a password in the process pool, returns (valid, new_hash).
+
+    Without a stored hash (unknown user) the dummy hash is checked and the result is
+    always invalid. Raises concurrent.futures.TimeoutError when the pool is too busy to
+    verify within `timeout`, and BrokenProcessPool when a worker died.
+    """
+    pool = get_password_pool()
+    try:
+        if hashed_password is None:
+            pool.submit(check_password, password or "", dummy_hash()).result(timeout=timeout)
+            return False, None
+        return pool.submit(check_password, password or "", hashed_password).result(timeout=timeout)
+    except BrokenProcessPool:
+        _discard_password_pool(pool)
+        raise
@@ -0,0 +1,69 @@
+import json
+
+from sqlalchemy import select
+
+from models import User
+
+# Columns read by bulk readers, the password hash never leaves the database
+BULK_USER_COLUMNS = (User.id, User.username, User.email, User.preferences)
+
+
+def preferences_filter(categories, match="any"):
+    """WHERE clause for users following the given categories.
+
+    match="any" uses && (overlap) and match="all" uses @> (contains). Both operators
+    are served by the GIN index on users.preferences.
+    """
+    if match == "all":
+        return User.preferences.contains(categories)
+    if match == "any":
+        return User.preferences.overlap(categories)
+    raise ValueError(f"Unknown match mode: {match}")
+
+
+def bulk_users_query(categories=None, match="any"):
+    """Users ordered by id with only the columns bulk readers need."""
+    query = select(*BULK_USER_COLUMNS).order_by(User.id)
+    if categories:
+        query = query.where(preferences_filter(categories, match))
+    return query
+
+
+def category_user_ids_query(categories, match="any", after_id=0, limit=1000):
+    """One page of ids of the users following the categories, ordered by id.
+
+    Keyset paging: pass the last id of the previous page as after_id.
+    """
+    return (
+        select(User.id)
+        .where(preferences_filter(categories, match))
+        .where(User.id > after_id)
+        .order_by(User.id)
+        .limit(limit)
+    )
+
+
+def category_user_ids_page(db, categories, match="any", after_id=0, limit=1000):
+    """Returns (user_ids, next_after_id), next_after_id is None on the last page."""
+    user_ids = db.execute(category_user_ids_query(categories, match, after_id, limit)).scalars().all()
+    return user_ids, (user_ids[-1] if len(user_ids) == limit else None)
+
+
+def stream_users_ndjson(session_factory, query, batch_size=1000):
+    """Yield the query result as NDJSON chunks, one chunk per fetched batch.
+
+    yield_per makes psycopg2 use a server-side cursor, so memory stays constant no
+    matter how many users match. The session is closed when the generator finishes
+    or the client disconnects.
+    """
+    db = session_factory()
+    try:
+        result = db.execute(query.execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            yield "".join(
+                json.dumps({"id": row.id, "username": row.username, "email": row.email,
+                            "preferences": row.preferences or []}) + "\n"
+                for row in rows
+            )
+    finally:
+        db.close()
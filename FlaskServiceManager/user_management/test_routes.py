@@ -0,0 +1,47 @@
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from flask import Flask
+
+import routes
+
+
+class FakeQuery:
+    def filter(self, *args):
+        return self
+
+    def first(self):
+        return None
+
+
+class FakeSession:
+    def query(self, model):
+        return FakeQuery()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(routes, "get_request_db", FakeSession)
+    app = Flask(__name__)
+    app.register_blueprint(routes.bp)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("error", [FuturesTimeoutError(), BrokenProcessPool("A child process terminated")])
+def test_login_returns_503_when_password_workers_are_unavailable(client, monkeypatch, error):
+    def verify_password(password, hashed_password=None):
+        raise error
+
+    monkeypatch.setattr(routes, "verify_password", verify_password)
+    response = client.post("/login", json={"username": "alice", "password": "secret"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(routes.LOGIN_RETRY_AFTER)
+
+
+def test_unknown_user_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(routes, "verify_password", lambda password, hashed_password=None: (False, None))
+    response = client.post("/login", json={"username": "alice", "password": "secret"})
+
+    assert response.status_code == 400
@@ -0,0 +1,83 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_service_path(*parts):
+    """Make a service directory importable, the services use flat module imports.
+
+    common/ is added as well, the Dockerfiles copy it next to each service's code.
+    """
+    common = os.path.join(ROOT_DIR, "common")
+    if common not in sys.path:
+        sys.path.append(common)
+    path = os.path.join(ROOT_DIR, *parts)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    return path
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, latencies, wall_time):
+    """Build a result dict from per-call latencies (seconds) and total wall time."""
+    count = len(latencies)
+    return {
+        "name": name,
+        "count": count,
+        "wall_time_s": round(wall_time, 4),
+        "throughput_per_s": round(count / wall_time, 2) if wall_time else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def print_results(results):
+    print(f"{'scenario':<32}{'count':>8}{'per_s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        print(f"{r['name']:<32}{r['count']:>8}{r['throughput_per_s']:>12}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+
+
+def prepare_database(url, name):
+    """Create the scratch database `name` on the server of `url` if needed, returns its URL."""
+    from sqlalchemy import create_engine, text
+
+    admin = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    with admin.connect() as connection:
+        if not connection.execute(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": name}).scalar():
+            connection.execute(text(f'CREATE DATABASE "{name}"'))
+    admin.dispose()
+    return url.set(database=name)
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_asgi_server(asgi_app, port):
+    """Serve an ASGI app with uvicorn from a daemon thread and wait until it accepts connections."""
+    import uvicorn
+
+    config = uvicorn.Config(asgi_app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("Stub server did not start")
+        time.sleep(0.01)
+    return server
@@ -0,0 +1,353 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+
+import pika.frame
+import pika.spec
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+CATEGORIES = ["business", "crime", "domestic", "education", "entertainment",
+              "environment", "food", "health", "lifestyle", "other", "politics",
+              "science", "sports", "technology", "top", "tourism", "world"]
+
+
+class FakeNewsAPI:
+    """Local stand-in for the newsdata.io `latest` endpoint (BASE_URL)."""
+
+    def __init__(self, latency=0.05, results_per_page=10):
+        self.latency = latency
+        self.results_per_page = results_per_page
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self.app = Starlette(routes=[Route("/api/1/latest", self.latest)])
+
+    async def latest(self, request):
+        with self._lock:
+            self.calls += 1
+        await asyncio.sleep(self.latency)
+        category = request.query_params.get("category", "top")
+        results = []
+        for i in range(self.results_per_page):
+            article_id = next(self._ids)
+            results.append({
+                "article_id": str(article_id),
+                "title": f"{category} headline {i}",
+                "link": f"https://news.example.com/{category}/{i}",
+                "description": f"Description of {category} story {i}",
+                "category": [category, CATEGORIES[i % len(CATEGORIES)]],
+            })
+        return JSONResponse({"status": "success", "totalResults": len(results), "results": results})
+
+
+async def fake_summary(link, latency=0.2, counter=None):
+    """Stand-in for generate_summary, sleeps like a Gemini call."""
+    if counter is not None:
+        counter.append(link)
+    await asyncio.sleep(latency)
+    return {"summary": f"Summary of {link}"}
+
+
+class FakePart:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    """Mimics response.candidates[0].content.parts[0].text of the Gemini client."""
+
+    def __init__(self, text):
+        content = type("Content", (), {"parts": [FakePart(text)]})()
+        self.candidates = [type("Candidate", (), {"content": content})()]
+
+
+class FakeGenerativeModel:
+    """Blocking stand-in for genai.GenerativeModel with injected latency."""
+
+    def __init__(self, latency=0.5):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, request_options=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return FakeResponse('{"summary": "A fake summary."}')
+
+
+class FakeGemini:
+    """Local stand-in for the Gemini REST API (generateContent), with injected latency.
+
+    news_aggregation reaches it through GEMINI_API_ENDPOINT.
+    """
+
+    def __init__(self, latency=0.5):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        # The path is /v1beta/models/<model>:generateContent
+        self.routes = [Route("/v1beta/models/{model_method}", self.generate_content, methods=["POST"])]
+
+    async def generate_content(self, request):
+        with self._lock:
+            self.calls += 1
+        await asyncio.sleep(self.latency)
+        return JSONResponse({"candidates": [{
+            "content": {"role": "model", "parts": [{"text": '{"summary": "A fake summary."}'}]},
+            "finishReason": "STOP",
+        }]})
+
+
+class RecordingSMTPHandler:
+    """aiosmtpd handler that keeps the arrival time of every message by recipient."""
+
+    def __init__(self):
+        self.received = {}
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        now = time.time()
+        with self._lock:
+            for recipient in envelope.rcpt_tos:
+                self.received.setdefault(recipient, []).append(now)
+        return "250 Message accepted for delivery"
+
+    def stats(self):
+        with self._lock:
+            return {recipient: list(times) for recipient, times in self.received.items()}
+
+
+class FakeAMQPBroker:
+    """Minimal AMQP 0-9-1 broker for running the services without RabbitMQ.
+
+    Implements what pika uses here: the default exchange with one queue per routing
+    key, publisher confirms, basic.consume with prefetch, ack/nack (multiple and
+    requeue) and requeueing of unacked messages when a channel closes. Nothing is
+    persisted. Frames are encoded and decoded with pika's own codec.
+    """
+
+    def __init__(self):
+        self.queues = {}
+        self.published = 0
+        self.delivered = 0
+
+    def queue(self, name):
+        if name not in self.queues:
+            self.queues[name] = {"messages": deque(), "consumers": deque()}
+        return self.queues[name]
+
+    def publish(self, queue_name, properties, body):
+        self.published += 1
+        self.queue(queue_name)["messages"].append((properties, body, False))
+        self.dispatch(queue_name)
+
+    def requeue(self, queue_name, properties, body):
+        self.queue(queue_name)["messages"].appendleft((properties, body, True))
+        self.dispatch(queue_name)
+
+    def dispatch(self, queue_name):
+        """Deliver queued messages round-robin to the consumers with prefetch room."""
+        queue = self.queue(queue_name)
+        messages, consumers = queue["messages"], queue["consumers"]
+        while messages and consumers:
+            for _ in range(len(consumers)):
+                channel, consumer_tag = consumers[0]
+                consumers.rotate(-1)
+                if channel.has_room():
+                    properties, body, redelivered = messages.popleft()
+                    self.delivered += 1
+                    channel.deliver(consumer_tag, queue_name, properties, body, redelivered)
+                    break
+            else:
+                return
+
+    def remove_consumers(self, channel):
+        for name, queue in self.queues.items():
+            remaining = [consumer for consumer in queue["consumers"] if consumer[0] is not channel]
+            queue["consumers"] = deque(remaining)
+
+    def stats(self):
+        return {"published": self.published, "delivered": self.delivered,
+                "queued": {name: len(queue["messages"]) for name, queue in self.queues.items()}}
+
+    async def serve(self, host, port):
+        return await asyncio.get_running_loop().create_server(
+            lambda: _AMQPConnection(self), host, port)
+
+    def start(self, host="127.0.0.1", port=5672):
+        """Serve from a daemon thread with its own event loop, returns once it listens."""
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(self.serve(host, port))
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="fake-amqp-broker", daemon=True).start()
+        started.wait(10)
+
+
+class _AMQPChannel:
+    def __init__(self, connection, number):
+        self.connection = connection
+        self.number = number
+        self.prefetch = 0
+        self.confirm = False
+        self.publish_count = 0
+        self.delivery_tags = itertools.count(1)
+        self.unacked = {}  # delivery tag -> (queue, properties, body)
+        self.pending = None  # basic.publish waiting for its header and body frames
+
+    def has_room(self):
+        return not self.prefetch or len(self.unacked) < self.prefetch
+
+    def deliver(self, consumer_tag, queue_name, properties, body, redelivered):
+        tag = next(self.delivery_tags)
+        self.unacked[tag] = (queue_name, properties, body)
+        self.connection.send_content(
+            self.number,
+            pika.spec.Basic.Deliver(consumer_tag=consumer_tag, delivery_tag=tag, redelivered=redelivered,
+                                    exchange="", routing_key=queue_name),
+            properties, body)
+
+    def settle(self, delivery_tag, multiple, requeue=None):
+        """Remove acked (or nacked) messages, nacked ones go back to their queue when requeue is set."""
+        tags = [tag for tag in self.unacked if tag <= delivery_tag] if multiple else [delivery_tag]
+        if multiple and delivery_tag == 0:
+            tags = list(self.unacked)
+        queues = set()
+        for tag in tags:
+            queue_name, properties, body = self.unacked.pop(tag, (None, None, None))
+            if queue_name is None:
+                continue
+            queues.add(queue_name)
+            if requeue:
+                self.connection.broker.requeue(queue_name, properties, body)
+        for queue_name in queues:
+            self.connection.broker.dispatch(queue_name)
+
+    def close(self):
+        self.connection.broker.remove_consumers(self)
+        self.settle(0, multiple=True, requeue=True)
+
+
+class _AMQPConnection(asyncio.Protocol):
+    FRAME_MAX = 131072
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.buffer = b""
+        self.channels = {}
+        self.transport = None
+        self.consumer_tags = itertools.count(1)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        for channel in self.channels.values():
+            channel.close()
+        self.channels.clear()
+
+    def send(self, channel_number, method):
+        self.transport.write(pika.frame.Method(channel_number, method).marshal())
+
+    def send_content(self, channel_number, method, properties, body):
+        frames = [pika.frame.Method(channel_number, method).marshal(),
+                  pika.frame.Header(channel_number, len(body), properties).marshal()]
+        chunk = self.FRAME_MAX - 8
+        for start in range(0, len(body), chunk):
+            frames.append(pika.frame.Body(channel_number, body[start:start + chunk]).marshal())
+        self.transport.write(b"".join(frames))
+
+    def data_received(self, data):
+        self.buffer += data
+        while self.buffer:
+            consumed, frame = pika.frame.decode_frame(self.buffer)
+            if not consumed:
+                return
+            self.buffer = self.buffer[consumed:]
+            self.handle(frame)
+
+    def handle(self, frame):
+        if isinstance(frame, pika.frame.ProtocolHeader):
+            self.send(0, pika.spec.Connection.Start(
+                server_properties={"product": "fake broker", "capabilities": {
+                    "publisher_confirms": True, "basic.nack": True, "consumer_cancel_notify": True}},
+                mechanisms="PLAIN", locales="en_US"))
+            return
+        if isinstance(frame, pika.frame.Heartbeat):
+            return
+        channel = self.channels.get(frame.channel_number)
+        if isinstance(frame, pika.frame.Header):
+            channel.pending[1] = frame.properties
+            channel.pending[2] = frame.body_size
+            self.complete_publish(channel)
+            return
+        if isinstance(frame, pika.frame.Body):
+            channel.pending[3].append(frame.fragment)
+            self.complete_publish(channel)
+            return
+        self.handle_method(frame.channel_number, channel, frame.method)
+
+    def complete_publish(self, channel):
+        method, properties, size, fragments = channel.pending
+        body = b"".join(fragments)
+        if size is None or len(body) < size:
+            return
+        channel.pending = None
+        self.broker.publish(method.routing_key, properties, body)
+        if channel.confirm:
+            channel.publish_count += 1
+            self.send(channel.number, pika.spec.Basic.Ack(delivery_tag=channel.publish_count))
+
+    def handle_method(self, number, channel, method):
+        spec = pika.spec
+        if isinstance(method, spec.Connection.StartOk):
+            self.send(0, spec.Connection.Tune(channel_max=2047, frame_max=self.FRAME_MAX, heartbeat=0))
+        elif isinstance(method, spec.Connection.TuneOk):
+            pass
+        elif isinstance(method, spec.Connection.Open):
+            self.send(0, spec.Connection.OpenOk())
+        elif isinstance(method, spec.Connection.Close):
+            self.send(0, spec.Connection.CloseOk())
+            self.transport.close()
+        elif isinstance(method, spec.Channel.Open):
+            self.channels[number] = _AMQPChannel(self, number)
+            self.send(number, spec.Channel.OpenOk())
+        elif isinstance(method, spec.Channel.Close):
+            self.channels.pop(number).close()
+            self.send(number, spec.Channel.CloseOk())
+        elif isinstance(method, spec.Confirm.Select):
+            channel.confirm = True
+            self.send(number, spec.Confirm.SelectOk())
+        elif isinstance(method, spec.Queue.Declare):
+            queue = self.broker.queue(method.queue)
+            self.send(number, spec.Queue.DeclareOk(queue=method.queue, message_count=len(queue["messages"]),
+                                                   consumer_count=len(queue["consumers"])))
+        elif isinstance(method, spec.Basic.Qos):
+            channel.prefetch = method.prefetch_count
+            self.send(number, spec.Basic.QosOk())
+        elif isinstance(method, spec.Basic.Consume):
+            consumer_tag = method.consumer_tag or f"ctag-{next(self.consumer_tags)}"
+            self.broker.queue(method.queue)["consumers"].append((channel, consumer_tag))
+            self.send(number, spec.Basic.ConsumeOk(consumer_tag=consumer_tag))
+            self.broker.dispatch(method.queue)
+        elif isinstance(method, spec.Basic.Cancel):
+            self.broker.remove_consumers(channel)
+            self.send(number, spec.Basic.CancelOk(consumer_tag=method.consumer_tag))
+        elif isinstance(method, spec.Basic.Publish):
+            channel.pending = [method, None, None, []]
+        elif isinstance(method, spec.Basic.Ack):
+            channel.settle(method.delivery_tag, method.multiple)
+        elif isinstance(method, spec.Basic.Nack):
+            channel.settle(method.delivery_tag, method.multiple, requeue=method.requeue)
+        elif isinstance(method, spec.Basic.Reject):
+            channel.settle(method.delivery_tag, False, requeue=method.requeue)
@@ -0,0 +1,115 @@
+"""Gateway auth dependency: JWT decode on every request vs the verified token cache.
+
+Issues access tokens for --users users and calls the dependency --requests times,
+picking the token of a random user each time, for HS256, RS256 and EdDSA (Ed25519):
+
+  decode per request  jwt.decode with the key as configured (secret or PEM), like the old dependency
+  preloaded key       authentication.verify_token without the cache, keys parsed once at startup
+  cached dependency   app.get_current_user, the first request per token verifies it
+
+The asymmetric keys are generated into a temporary directory and loaded through
+JWT_PRIVATE_KEY_FILE / JWT_PUBLIC_KEY_FILE like in a deployment.
+
+    python benchmarks/bench_auth_dependency.py --users 1000 --requests 20000
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+from _common import add_service_path, print_results, summarize
+
+
+def write_keys(directory, name, private_key):
+    private_path = os.path.join(directory, f"{name}.pem")
+    public_path = os.path.join(directory, f"{name}.pub.pem")
+    with open(private_path, "wb") as f:
+        f.write(private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                          serialization.NoEncryption()))
+    with open(public_path, "wb") as f:
+        f.write(private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                      serialization.PublicFormat.SubjectPublicKeyInfo))
+    return private_path, public_path
+
+
+def load_gateway(algorithm, private_path=None, public_path=None):
+    """Import the gateway with the given JWT settings, the keys are loaded at import."""
+    os.environ["ALGORITHM"] = algorithm
+    for name, value in (("JWT_PRIVATE_KEY_FILE", private_path), ("JWT_PUBLIC_KEY_FILE", public_path)):
+        if value:
+            os.environ[name] = value
+        else:
+            os.environ.pop(name, None)
+    for module in ("authentication", "app"):
+        if module in sys.modules:
+            importlib.reload(sys.modules[module])
+    import authentication
+    import app
+    return authentication, app
+
+
+async def timed(name, call, tokens):
+    latencies = []
+    start = time.perf_counter()
+    for token in tokens:
+        call_start = time.perf_counter()
+        result = call(token)
+        if asyncio.iscoroutine(result):
+            result = await result
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(name, latencies, time.perf_counter() - start)
+
+
+async def run(algorithm, authentication, app, raw_key, args):
+    user_tokens = [authentication.create_access_token(user_id) for user_id in range(1, args.users + 1)]
+    rng = random.Random(1)
+    tokens = [rng.choice(user_tokens) for _ in range(args.requests)]
+
+    def decode_per_request(token):
+        return jwt.decode(token, raw_key, algorithms=[algorithm])
+
+    def preloaded_key(token):
+        return authentication.verify_token(token, cache=None)
+
+    return [
+        await timed(f"{algorithm} decode per request", decode_per_request, tokens),
+        await timed(f"{algorithm} preloaded key", preloaded_key, tokens),
+        await timed(f"{algorithm} cached dependency", app.get_current_user, tokens),
+    ]
+
+
+def main(args):
+    os.environ["TOKEN_CACHE_MAX_ENTRIES"] = str(args.cache_entries)
+    add_service_path("FastApi")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        rsa_private, rsa_public = write_keys(directory, "rsa", rsa.generate_private_key(65537, 2048))
+        ed_private, ed_public = write_keys(directory, "ed25519", ed25519.Ed25519PrivateKey.generate())
+        for algorithm, private_path, public_path in (("HS256", None, None),
+                                                     ("RS256", rsa_private, rsa_public),
+                                                     ("EdDSA", ed_private, ed_public)):
+            authentication, app = load_gateway(algorithm, private_path, public_path)
+            if public_path:
+                with open(public_path, "rb") as f:
+                    raw_key = f.read()
+            else:
+                raw_key = authentication.SECRET_KEY
+            results.extend(asyncio.run(run(algorithm, authentication, app, raw_key, args)))
+            print(f"{algorithm} token cache: {authentication.token_cache.stats()}")
+    print_results(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--cache-entries", type=int, default=10000)
+    main(parser.parse_args())
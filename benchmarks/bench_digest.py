@@ -0,0 +1,102 @@
+"""Bulk digest: one digest per user vs one digest per distinct preference set.
+
+Users with 1-5 categories (popular categories are picked more often) are served
+from memory in pages. Building a digest sleeps --build-ms to stand in for the
+category lookups, article selection and summary checks of build_news, with at
+most --concurrency builds at once. Publishing a delivery job sleeps --publish-ms.
+
+    python benchmarks/bench_digest.py --users 20000 --page-size 1000 --build-ms 10
+"""
+import argparse
+import asyncio
+import random
+
+from _common import add_service_path
+from _fakes import CATEGORIES
+
+add_service_path("FlaskServiceManager", "news_aggregation")
+from digest import DigestJob  # noqa: E402
+
+
+def make_users(count, rng):
+    weights = [1.0 / (rank + 1) for rank in range(len(CATEGORIES))]
+    users = []
+    for user_id in range(1, count + 1):
+        preferences = set()
+        for _ in range(rng.randint(1, 5)):
+            preferences.add(rng.choices(CATEGORIES, weights)[0])
+        users.append({"id": user_id, "username": f"user{user_id}", "email": f"user{user_id}@example.com",
+                      "preferences": sorted(preferences)})
+    return users
+
+
+class Scenario:
+    def __init__(self, users, args):
+        self.users = users
+        self.args = args
+        self.builds = 0
+        self.semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def fetch_page(self, after_id, limit):
+        await asyncio.sleep(self.args.page_ms / 1000.0)
+        start = after_id or 0
+        page = self.users[start:start + limit]
+        next_after_id = page[-1]["id"] if len(page) == limit and start + limit < len(self.users) else None
+        return page, next_after_id
+
+    async def build_digest(self, categories):
+        async with self.semaphore:
+            self.builds += 1
+            await asyncio.sleep(self.args.build_ms / 1000.0)
+            return [], [{"category": categories, "title": "Headline"}]
+
+    async def publish(self, user, digest):
+        await asyncio.sleep(self.args.publish_ms / 1000.0)
+
+
+async def run_per_user(users, args):
+    scenario = Scenario(users, args)
+
+    async def process(user):
+        digest = await scenario.build_digest(user["preferences"])
+        await scenario.publish(user, digest)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    after_id = None
+    while True:
+        page, after_id = await scenario.fetch_page(after_id, args.page_size)
+        await asyncio.gather(*(process(user) for user in page))
+        if after_id is None:
+            break
+    wall_time = loop.time() - start
+    report = {"users": len(users), "distinct_preference_sets": "-", "wall_time_s": round(wall_time, 3),
+              "users_per_s": round(len(users) / wall_time, 1)}
+    return report, scenario.builds
+
+
+async def run_grouped(users, args):
+    scenario = Scenario(users, args)
+    job = DigestJob(scenario.fetch_page, scenario.build_digest, scenario.publish, CATEGORIES, args.page_size)
+    report = await job.run()
+    return report, scenario.builds
+
+
+def main(args):
+    users = make_users(args.users, random.Random(1))
+    print(f"{'scenario':<24}{'users':>8}{'builds':>9}{'sets':>7}{'wall s':>9}{'users/s':>11}")
+    for name, run in (("digest per user", run_per_user), ("digest per pref set", run_grouped)):
+        report, builds = asyncio.run(run(users, args))
+        print(f"{name:<24}{report['users']:>8}{builds:>9}{report['distinct_preference_sets']:>7}"
+              f"{report['wall_time_s']:>9}{report['users_per_s']:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--page-ms", type=float, default=5)
+    parser.add_argument("--build-ms", type=float, default=10)
+    parser.add_argument("--publish-ms", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    main(parser.parse_args())
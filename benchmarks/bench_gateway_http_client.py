@@ -0,0 +1,76 @@
+"""Gateway upstream calls: a new httpx.AsyncClient per request vs the shared pooled client.
+
+Runs a local stub of the manager sidecar and reports p50/p99 latency and requests/s.
+
+    python benchmarks/bench_gateway_http_client.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from _common import add_service_path, free_port, print_results, run_asgi_server, summarize
+
+add_service_path("FastApi")
+from dapr_client import create_http_client  # noqa: E402
+
+
+async def stub_probe(request):
+    return JSONResponse({"message": "Hello from Flask manager!"})
+
+
+stub_app = Starlette(routes=[Route("/v1.0/invoke/flaskmanager/method/call_service_b", stub_probe)])
+
+
+async def per_request_client(url):
+    async with httpx.AsyncClient() as client:
+        response = await client.get(url)
+        response.raise_for_status()
+
+
+async def drive(name, call, total, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return summarize(name, latencies, time.perf_counter() - start)
+
+
+async def main(args):
+    port = free_port()
+    server = run_asgi_server(stub_app, port)
+    url = f"http://127.0.0.1:{port}/v1.0/invoke/flaskmanager/method/call_service_b"
+
+    results = [await drive("before: client per request", lambda: per_request_client(url),
+                           args.requests, args.concurrency)]
+
+    client = create_http_client(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async def shared():
+            response = await client.get(url)
+            response.raise_for_status()
+
+        results.append(await drive("after: shared pooled client", shared, args.requests, args.concurrency))
+    finally:
+        await client.aclose()
+        server.should_exit = True
+
+    print_results(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
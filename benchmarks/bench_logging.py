@@ -0,0 +1,164 @@
+"""Logging cost on the request path: print/basicConfig vs the queued structured logger.
+
+Each simulated request logs what fetch_and_cache_news and the gateway logged per call:
+a few status lines, the whole news API page (--articles results) and the summaries.
+
+  before        logging.basicConfig stream handler and print(), the full page formatted
+                and written on the request thread
+  queue only    configure_logging(), same calls: formatting and writing move to the
+                writer thread, the page is logged on every request (cut to
+                LOG_MAX_MESSAGE_CHARS by the formatter)
+  after         configure_logging() with log_payload(): the page is logged for
+                LOG_PAYLOAD_SAMPLE_RATE of the requests, cut to LOG_PAYLOAD_MAX_CHARS
+
+--threads threads run --requests requests each and write to --output (a file, like the
+container's stdout). Each request also waits --io-ms milliseconds, as for its upstream
+calls; with 0 the threads only log, which the writer thread cannot keep up with. The
+report shows requests/s and latency of the logging calls on the request threads, the
+time the writer thread needed to drain afterwards, the records dropped because the
+queue was full and the bytes written.
+
+    python benchmarks/bench_logging.py --threads 8 --requests 2000
+"""
+import argparse
+import contextlib
+import logging
+import os
+import threading
+import time
+
+from _common import add_service_path, percentile
+
+add_service_path("FastApi")
+import structured_logging  # noqa: E402
+from structured_logging import configure_logging, log_payload, payload  # noqa: E402
+
+logger = logging.getLogger("news_aggregation")
+
+
+def news_page(category, articles):
+    """A newsdata.io `latest` page with the fields the real API returns."""
+    return {"status": "success", "totalResults": articles, "results": [{
+        "article_id": f"{category}-{i}",
+        "title": f"{category} headline {i} " + "t" * 60,
+        "link": f"https://news.example.com/{category}/{i}",
+        "keywords": [category, "news", "world"],
+        "creator": ["Reporter"],
+        "description": "d" * 400,
+        "content": "c" * 1500,
+        "pubDate": "2024-06-01 12:00:00",
+        "image_url": f"https://img.example.com/{category}/{i}.jpg",
+        "source_id": "example",
+        "category": [category],
+        "country": ["united states of america"],
+        "language": "english",
+    } for i in range(articles)]}
+
+
+def request_before(category, data, summaries):
+    logging.info(f"Fetching news for category: {category}, Status: 200")
+    logging.info(f"Data received for category {category}: {data}")
+    for summary in summaries:
+        logging.info(f"Generated summary: {summary}")
+    print("Preferences:", [category, "top"], flush=True)
+    logging.info(f"Cache updated for category {category} with {len(data['results'])} articles")
+
+
+def request_after(category, data, summaries):
+    logger.info(f"Fetching news for category: {category}, Status: 200")
+    log_payload(logger, logging.DEBUG, "Data received for category %s", data, category)
+    for summary in summaries:
+        logger.info("Generated summary for %s: %s", category, payload(summary, 200))
+    logger.info(f"Cache updated for category {category} with {len(data['results'])} articles")
+
+
+def request_queue_only(category, data, summaries):
+    logger.info(f"Fetching news for category: {category}, Status: 200")
+    logger.debug(f"Data received for category {category}: {data}")
+    for summary in summaries:
+        logger.info(f"Generated summary: {summary}")
+    logger.info(f"Cache updated for category {category} with {len(data['results'])} articles")
+
+
+def run(name, handle_request, args, output):
+    pages = [news_page(category, args.articles) for category in ("top", "technology", "sports", "world")]
+    summaries = ["s" * 300] * 3
+    latencies = [[] for _ in range(args.threads)]
+
+    def worker(index):
+        samples = latencies[index]
+        for i in range(args.requests):
+            page = pages[i % len(pages)]
+            start = time.perf_counter()
+            handle_request(page["results"][0]["category"][0], page, summaries)
+            samples.append(time.perf_counter() - start)
+            if args.io_ms:
+                # The rest of the request waits on the network
+                time.sleep(args.io_ms / 1000)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - start
+
+    dropped = getattr(logging.getLogger().handlers[0], "dropped", 0)
+    drain_start = time.perf_counter()
+    structured_logging.stop_logging()
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+    output.flush()
+    drain_time = time.perf_counter() - drain_start
+
+    samples = [latency for thread_samples in latencies for latency in thread_samples]
+    return {
+        "name": name,
+        "rps": round(len(samples) / wall_time, 1),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "drain_s": round(drain_time, 2),
+        "dropped": dropped,
+        "mb_written": round(os.fstat(output.fileno()).st_size / 1e6, 1),
+    }
+
+
+def main(args):
+    results = []
+    scenarios = (("before: print/basicConfig", request_before, None),
+                 ("queue only", request_queue_only, "DEBUG"),
+                 ("after: queue + sampling", request_after, "DEBUG"))
+    for name, handle_request, level in scenarios:
+        with open(args.output, "w") as output:
+            root = logging.getLogger()
+            if level is None:
+                # What logging.basicConfig(level=logging.INFO) sets up, print() goes to the same stream
+                handler = logging.StreamHandler(output)
+                handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+                root.handlers[:] = [handler]
+                root.setLevel(logging.INFO)
+                stdout = contextlib.redirect_stdout(output)
+            else:
+                configure_logging("news_aggregation", level=level, stream=output)
+                stdout = contextlib.nullcontext()
+            with stdout:
+                results.append(run(name, handle_request, args, output))
+    os.remove(args.output)
+
+    print(f"threads={args.threads} requests/thread={args.requests} articles/page={args.articles} io_ms={args.io_ms} "
+          f"sample_rate={structured_logging.LOG_PAYLOAD_SAMPLE_RATE} "
+          f"max_chars={structured_logging.LOG_PAYLOAD_MAX_CHARS}")
+    print(f"{'scenario':<28}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'drain s':>10}{'dropped':>9}{'MB':>8}")
+    for r in results:
+        print(f"{r['name']:<28}{r['rps']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['drain_s']:>10}{r['dropped']:>9}{r['mb_written']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--articles", type=int, default=10)
+    parser.add_argument("--io-ms", type=float, default=2)
+    parser.add_argument("--output", default="bench_logging.log")
+    main(parser.parse_args())
@@ -0,0 +1,252 @@
+"""Manager throughput: the Flask (WSGI) manager vs the ASGI manager with shared clients.
+
+Runs stubs of the user_management and news_aggregation sidecars and serves the
+manager in two versions:
+
+  before  a copy of the Flask routes as they were, served by werkzeug with a thread per
+          request: async views with a new event loop and httpx client per request, and
+          a new thread per news request
+  after   manager_app on uvicorn, shared pooled clients and the bounded news queue
+
+--clients concurrent clients call GET /users/<id>/preferences for --duration seconds.
+Then --news-requests POST /users/<id>/news requests are sent at once. The stub news
+service takes --news-delay seconds per request. The report shows the news requests
+accepted, rejected with 429 or failed (timeouts) and the peak thread count of the
+manager process (read from /proc, Linux only). The stubs, each manager and the
+clients run in separate processes.
+
+    python benchmarks/bench_manager_asgi.py --clients 50 --duration 10 --news-requests 2000
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import threading
+import time
+
+import aiohttp
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from werkzeug.serving import make_server
+
+from _common import add_service_path, free_port, percentile
+
+NEWS_DELAY = 2.0
+
+
+async def stub_preferences(request):
+    user_id = int(request.path_params["user_id"])
+    return JSONResponse({"id": user_id, "username": f"user{user_id}", "email": f"user{user_id}@example.com",
+                         "preferences": ["top", "technology"]})
+
+
+async def stub_news(request):
+    await asyncio.sleep(NEWS_DELAY)
+    return JSONResponse({"message": "News fetch request processed successfully.", "articles": 5})
+
+
+stub_app = Starlette(routes=[
+    Route("/v1.0/invoke/user_management/method/users/{user_id:int}/preferences", stub_preferences),
+    Route("/v1.0/invoke/news_aggregation/method/users/{user_id:int}/news", stub_news, methods=["POST"]),
+])
+
+
+def old_manager_app(user_management_url, news_aggregation_url):
+    """The manager routes before the change."""
+    import requests
+    from flask import Flask, abort, jsonify, request
+
+    app = Flask(__name__)
+
+    @app.route("/users/<int:user_id>/preferences", methods=["GET"])
+    async def get_user_preferences(user_id):
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(f"{user_management_url}/users/{user_id}/preferences",
+                                            headers={"Accept": "application/json"})
+                response.raise_for_status()
+                return jsonify(response.json()), 200
+        except httpx.HTTPStatusError as e:
+            abort(e.response.status_code, description=f"HTTP error from User Management Service: {e}")
+
+    def forward_news_request(user_id, preferences, username, email):
+        try:
+            requests.post(f"{news_aggregation_url}/users/{user_id}/news",
+                          json={"preferences": preferences, "username": username, "email": email})
+        except requests.RequestException:
+            pass
+
+    @app.route("/users/<int:user_id>/news", methods=["POST"])
+    def fetch_news(user_id):
+        data = request.json
+        threading.Thread(target=forward_news_request,
+                         args=(user_id, data["preferences"], data.get("username"), data.get("email"))).start()
+        return jsonify({"message": "News fetch request accepted and will be processed soon."})
+
+    return app
+
+
+def serve_old(port, user_management_url, news_aggregation_url):
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    make_server("127.0.0.1", port, old_manager_app(user_management_url, news_aggregation_url),
+                threaded=True).serve_forever()
+
+
+def serve_asgi(port, asgi_app):
+    import uvicorn
+    uvicorn.run(asgi_app, host="127.0.0.1", port=port, log_level="error", access_log=False)
+
+
+def serve_new(port):
+    import manager_app
+    logging.getLogger("manager_app").setLevel(logging.ERROR)
+    serve_asgi(port, manager_app.app)
+
+
+def start_process(target, port, *args):
+    process = multiprocessing.Process(target=target, args=(port,) + args, daemon=True)
+    process.start()
+    deadline = time.time() + 10
+    while True:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except httpx.TransportError:
+            if time.time() > deadline:
+                raise RuntimeError("Server did not start")
+            time.sleep(0.05)
+
+
+def thread_count(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
+
+
+def sample_threads(stop, pid, peak):
+    while not stop.is_set():
+        peak[0] = max(peak[0], thread_count(pid))
+        stop.wait(0.02)
+
+
+async def preferences_load(base_url, args):
+    # aiohttp drives the load, an httpx client slows down with many connections and would be
+    # the bottleneck here
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + args.duration
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.clients),
+                                     timeout=aiohttp.ClientTimeout(total=30)) as session:
+        async def one_client():
+            nonlocal errors
+            rng = random.Random()
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    async with session.get(f"{base_url}/users/{rng.randint(1, 10000)}/preferences") as response:
+                        await response.read()
+                        ok = response.status == 200
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_client() for _ in range(args.clients)))
+        wall_time = time.perf_counter() - start
+    return len(latencies) / wall_time, latencies, errors
+
+
+async def news_burst(base_url, args):
+    statuses = {}
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.clients),
+                                     timeout=aiohttp.ClientTimeout(total=60)) as session:
+        async def one(user_id):
+            try:
+                async with session.post(f"{base_url}/users/{user_id}/news",
+                                        json={"preferences": ["top"], "username": "u", "email": "u@example.com"}) as response:
+                    await response.read()
+                    status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                status = "error"
+            statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(user_id) for user_id in range(1, args.news_requests + 1)))
+        wall_time = time.perf_counter() - start
+    return statuses, wall_time
+
+
+def measure(name, process, base_url, args):
+    stop, peak = threading.Event(), [0]
+    sampler = threading.Thread(target=sample_threads, args=(stop, process.pid, peak), daemon=True)
+    sampler.start()
+    rps, latencies, errors = asyncio.run(preferences_load(base_url, args))
+    statuses, burst_time = asyncio.run(news_burst(base_url, args))
+    time.sleep(args.news_delay)
+    stop.set()
+    sampler.join()
+    return {
+        "name": name,
+        "rps": round(rps, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "errors": errors,
+        "news_accepted": statuses.get(200, 0),
+        "news_429": statuses.get(429, 0),
+        "news_failed": args.news_requests - statuses.get(200, 0) - statuses.get(429, 0),
+        "news_burst_s": round(burst_time, 2),
+        "peak_threads": peak[0],
+    }
+
+
+def main(args):
+    global NEWS_DELAY
+    NEWS_DELAY = args.news_delay
+    stub_port = free_port()
+    stub = start_process(serve_asgi, stub_port, stub_app)
+    user_management_url = f"http://127.0.0.1:{stub_port}/v1.0/invoke/user_management/method"
+    news_aggregation_url = f"http://127.0.0.1:{stub_port}/v1.0/invoke/news_aggregation/method"
+
+    os.environ["USER_MANAGEMENT_INVOKE_URL"] = user_management_url
+    os.environ["NEWS_AGGREGATION_INVOKE_URL"] = news_aggregation_url
+    os.environ["NEWS_FORWARD_WORKERS"] = str(args.news_workers)
+    os.environ["NEWS_QUEUE_SIZE"] = str(args.news_queue)
+    add_service_path("FlaskServiceManager")
+
+    results = []
+    for name, target, extra in (("before: Flask/WSGI", serve_old, (user_management_url, news_aggregation_url)),
+                                ("after: ASGI", serve_new, ())):
+        port = free_port()
+        process = start_process(target, port, *extra)
+        try:
+            results.append(measure(name, process, f"http://127.0.0.1:{port}", args))
+        finally:
+            process.terminate()
+            process.join()
+    stub.terminate()
+
+    print(f"clients={args.clients} news_requests={args.news_requests} news_delay={args.news_delay}s "
+          f"news_workers={args.news_workers} news_queue={args.news_queue}")
+    print(f"{'manager':<22}{'rps':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'news ok':>9}{'news 429':>10}"
+          f"{'failed':>8}{'burst s':>9}{'threads':>9}")
+    for r in results:
+        print(f"{r['name']:<22}{r['rps']:>9}{r['p50_ms']:>9}{r['p99_ms']:>9}{r['errors']:>8}{r['news_accepted']:>9}"
+              f"{r['news_429']:>10}{r['news_failed']:>8}{r['news_burst_s']:>9}{r['peak_threads']:>9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--news-requests", type=int, default=2000)
+    parser.add_argument("--news-delay", type=float, default=2.0)
+    parser.add_argument("--news-workers", type=int, default=16)
+    parser.add_argument("--news-queue", type=int, default=1000)
+    main(parser.parse_args())
@@ -0,0 +1,83 @@
+"""Login password verification: bcrypt on the request threads vs the process pool.
+
+Verifies --logins passwords at cost --rounds with:
+
+  inline, 1 thread   bcrypt.checkpw on one thread, like one Flask worker
+  inline, N threads  bcrypt.checkpw on --threads request threads
+  process pool       passwords.verify_password from --threads request threads
+
+It reports logins/s and logins/s per core. It also compares the time of a failed
+login for a wrong password with one for an unknown username, which is checked
+against the dummy hash.
+
+    python benchmarks/bench_password_verify.py --rounds 12 --logins 64 --threads 16
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import add_service_path, percentile
+
+
+def timed(func, items, threads):
+    latencies = []
+
+    def call(item):
+        start = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, items))
+    return time.perf_counter() - start, latencies
+
+
+def main(args):
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    add_service_path("FlaskServiceManager", "user_management")
+    import bcrypt
+    import passwords
+
+    cores = os.cpu_count() or 1
+    stored = passwords.hash_password("correct horse", args.rounds)
+    items = range(args.logins)
+    print(f"bcrypt cost {args.rounds}, {cores} cores, {passwords.PASSWORD_PROCESSES} pool processes")
+    print(f"{'mode':<22}{'logins/s':>10}{'per core':>10}{'p50 ms':>10}{'p99 ms':>10}")
+
+    def inline(_):
+        bcrypt.checkpw(b"correct horse", stored.encode("utf-8"))
+
+    def pooled(_):
+        passwords.verify_password("correct horse", stored)
+
+    passwords.get_password_pool().submit(passwords.hash_rounds, stored).result()  # start the workers
+    for name, func, threads in (("inline, 1 thread", inline, 1),
+                                (f"inline, {args.threads} threads", inline, args.threads),
+                                ("process pool", pooled, args.threads)):
+        wall_time, latencies = timed(func, items, threads)
+        rate = args.logins / wall_time
+        print(f"{name:<22}{rate:>10.1f}{rate / cores:>10.1f}"
+              f"{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 99) * 1000:>10.1f}")
+
+    # Failed logins should not reveal whether the username exists
+    passwords.dummy_hash()
+    _, wrong = timed(lambda _: passwords.verify_password("wrong", stored), range(args.samples), 1)
+    _, unknown = timed(lambda _: passwords.verify_password("wrong", None), range(args.samples), 1)
+    print(f"failed login p50: wrong password {percentile(wrong, 50) * 1000:.1f} ms, "
+          f"unknown user {percentile(unknown, 50) * 1000:.1f} ms")
+
+    # A hash stored at a lower cost is replaced on the next successful login
+    old = passwords.hash_password("correct horse", max(4, args.rounds - 2))
+    valid, new_hash = passwords.verify_password("correct horse", old)
+    print(f"rehash on login: valid={valid}, cost {passwords.hash_rounds(old)} -> {passwords.hash_rounds(new_hash)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=8)
+    main(parser.parse_args())
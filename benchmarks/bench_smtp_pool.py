@@ -0,0 +1,92 @@
+"""Email throughput: a new SMTP session per message vs the pooled sender.
+
+Sends digest emails to a local aiosmtpd server. --handshake-ms adds a delay to
+EHLO to stand in for the STARTTLS and login round trips of a real server.
+
+    python benchmarks/bench_smtp_pool.py --messages 500 --pool-size 4 --handshake-ms 20
+"""
+import argparse
+import asyncio
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiosmtpd.controller import Controller
+
+from _common import add_service_path, free_port, print_results, summarize
+
+add_service_path("FlaskServiceManager", "email_bot")
+from app import build_message  # noqa: E402
+from smtp_pool import SMTPPool  # noqa: E402
+
+
+class CountingHandler:
+    def __init__(self, handshake):
+        self.handshake = handshake
+        self.received = 0
+        self._lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.received += 1
+        return "250 Message accepted for delivery"
+
+
+def digest(i):
+    news = [{"category": ["top"], "title": f"Headline {j}", "description": "Description",
+             "link": f"https://news.example.com/{j}", "summary": "Summary"} for j in range(5)]
+    return build_message(news, f"user{i}", f"user{i}@example.com")
+
+
+def main(args):
+    handler = CountingHandler(args.handshake_ms / 1000.0)
+    port = free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    messages = [digest(i) for i in range(args.messages)]
+    results = []
+
+    try:
+        # Before: what send_email did for every message (without TLS/login on the stand-in)
+        latencies = []
+        start = time.perf_counter()
+        for msg in messages:
+            t = time.perf_counter()
+            with smtplib.SMTP("127.0.0.1", port) as server:
+                server.send_message(msg)
+            latencies.append(time.perf_counter() - t)
+        results.append(summarize("before: session per message", latencies, time.perf_counter() - start))
+
+        pool = SMTPPool("127.0.0.1", port, size=args.pool_size, starttls=False,
+                        max_messages_per_connection=args.messages)
+        latencies = []
+
+        def timed(msg):
+            t = time.perf_counter()
+            pool.send(msg)
+            latencies.append(time.perf_counter() - t)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.pool_size) as executor:
+            list(executor.map(timed, messages))
+        results.append(summarize(f"after: pool of {args.pool_size}", latencies, time.perf_counter() - start))
+        pool.close()
+
+        print_results(results)
+        print(f"received by server: {handler.received}")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--handshake-ms", type=float, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,55 @@
+"""Summaries for a gathered batch of categories: blocking calls vs the Summarizer pool.
+
+Uses a fake Gemini model that sleeps for --latency-ms per call.
+
+    python benchmarks/bench_summarizer.py --articles 17 --latency-ms 500
+"""
+import argparse
+import asyncio
+import time
+
+from _common import add_service_path, print_results, summarize
+from _fakes import FakeGenerativeModel
+
+add_service_path("FlaskServiceManager", "news_aggregation")
+from summarizer import Summarizer  # noqa: E402
+
+
+async def run(name, summarize_one, articles):
+    latencies = []
+    start = time.perf_counter()
+
+    async def one(i):
+        # Measured from the start of the gather: when each summary becomes available
+        await summarize_one(f"Summarize https://news.example.com/{i}")
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(articles)))
+    return summarize(name, latencies, time.perf_counter() - start)
+
+
+def main(args):
+    latency = args.latency_ms / 1000.0
+    model = FakeGenerativeModel(latency)
+
+    async def blocking(prompt):
+        # What generate_summary did before: a sync call inside a coroutine
+        return model.generate_content(prompt)
+
+    summarizer = Summarizer(FakeGenerativeModel(latency), max_workers=args.workers,
+                            rate_per_minute=args.rate_per_minute, timeout=30)
+
+    results = [
+        asyncio.run(run("before: blocking call", blocking, args.articles)),
+        asyncio.run(run(f"after: pool of {args.workers}", summarizer.generate, args.articles)),
+    ]
+    print_results(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=17)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate-per-minute", type=float, default=6000)
+    main(parser.parse_args())
@@ -0,0 +1,86 @@
+"""Telegram delivery under a burst: one request per message vs the queued sender.
+
+Runs tel_bot/mock_telegram_api.py locally, which enforces Telegram's flood limits
+and 4096 character cap, and sends a burst of digests to a few chats. Reports how
+many digests arrived, how many requests were rejected and the wall time.
+
+    python benchmarks/bench_telegram_sender.py --digests 60 --chats 3
+"""
+import argparse
+import logging
+import random
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+from werkzeug.serving import make_server
+
+from _common import add_service_path, free_port
+
+add_service_path("FlaskServiceManager", "tel_bot")
+import mock_telegram_api  # noqa: E402
+from telegram_sender import TelegramSender  # noqa: E402
+
+
+def digest(i, rng):
+    # Most digests are short, some are longer than one Telegram message
+    items = rng.choice([2, 3, 5, 40])
+    parts = [f"User: user{i}\nEmail: user{i}@example.com\n"]
+    for j in range(items):
+        parts.append(f"Category: top\nTitle: Headline {j}\nDescription: {'d' * 80}\n"
+                     f"Link:https://news.example.com/{i}/{j}\nSummary: {'s' * 120}")
+    return "Received news data:\n\n" + "\n\n".join(parts)
+
+
+def reset(base_url):
+    requests.delete(f"{base_url}/messages")
+
+
+def report(name, base_url, wall_time, digests):
+    data = requests.get(f"{base_url}/messages").json()
+    # Count digests by their header, a coalesced message carries several
+    delivered = {part.split("\n", 1)[0] for m in data["messages"] for part in m["text"].split("User: ")[1:]}
+    print(f"{name:<28}{len(delivered):>6}/{digests:<6}{len(data['messages']):>10}"
+          f"{data['rejected']['flood']:>8}{data['rejected']['too_long']:>10}{wall_time:>10.2f}")
+
+
+def main(args):
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    port = free_port()
+    server = make_server("127.0.0.1", port, mock_telegram_api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{port}"
+    rng = random.Random(1)
+    burst = [(str(i % args.chats), digest(i, rng)) for i in range(args.digests)]
+
+    print(f"{'scenario':<28}{'digests':>13}{'api msgs':>10}{'429s':>8}{'too long':>10}{'wall s':>10}")
+    try:
+        # Before: what send_telegram_message did, text in the query string and no limits
+        reset(base_url)
+        start = time.perf_counter()
+        for chat_id, text in burst:
+            requests.post(f"{base_url}/bottoken/sendMessage?chat_id={chat_id}&text={quote(text)}")
+        report("request per message", base_url, time.perf_counter() - start, args.digests)
+
+        reset(base_url)
+        sender = TelegramSender("token", api_url=base_url, global_rate=args.global_rate,
+                                chat_rate=args.chat_rate, workers=args.workers)
+        start = time.perf_counter()
+        for chat_id, text in burst:
+            sender.send(chat_id, text)
+        sender.flush(timeout=600)
+        report("queued sender", base_url, time.perf_counter() - start, args.digests)
+        print(sender.stats())
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--digests", type=int, default=60)
+    parser.add_argument("--chats", type=int, default=3)
+    parser.add_argument("--global-rate", type=float, default=30)
+    parser.add_argument("--chat-rate", type=float, default=1)
+    parser.add_argument("--workers", type=int, default=4)
+    main(parser.parse_args())
@@ -0,0 +1,92 @@
+"""Load test for single-flight category fetches in news_aggregation.
+
+1,000 concurrent users with up to 5 of the 17 categories each hit a cold cache
+backed by a fake news API and a fake summarizer. Reports upstream calls with and
+without coalescing and the coalescing hit rate.
+
+    python benchmarks/load_news_coalescing.py --users 1000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from _common import add_service_path, free_port, print_results, run_asgi_server, summarize
+from _fakes import CATEGORIES, FakeNewsAPI, fake_summary
+
+
+def main(args):
+    fake_api = FakeNewsAPI(latency=args.api_latency_ms / 1000.0)
+    port = free_port()
+    server = run_asgi_server(fake_api.app, port)
+
+    tmp_dir = tempfile.mkdtemp()
+    os.environ["BASE_URL"] = f"http://127.0.0.1:{port}/api/1/latest"
+    os.environ["CACHE_DB_PATH"] = os.path.join(tmp_dir, "news_cache.db")
+    add_service_path("FlaskServiceManager", "news_aggregation")
+    import app as news_app
+    from aiohttp import ClientSession
+    from news_cache import MemoryCache, SQLiteWriteBehindStore, TieredCache
+    from single_flight import SingleFlight
+
+    summaries = []
+
+    async def summarize_link(link):
+        return await fake_summary(link, args.summary_latency_ms / 1000.0, summaries)
+
+    news_app.generate_summary = summarize_link
+
+    random.seed(1)
+    users = [random.sample(CATEGORIES, random.randint(1, 5)) for _ in range(args.users)]
+
+    async def uncoalesced(session, category):
+        # Cache lookup as it was before single-flight
+        entry = news_app.news_cache.get(category)
+        if entry is not None and time.time() - entry["timestamp"] < news_app.CACHE_EXPIRY:
+            return entry["data"]
+        return await news_app.fetch_and_cache_news(session, category)
+
+    async def run(name, lookup):
+        news_app.news_cache = TieredCache(
+            MemoryCache(), SQLiteWriteBehindStore(os.path.join(tmp_dir, f"{name}.db"), flush_interval=60))
+        news_app.category_flight = SingleFlight()
+        fake_api.calls = 0
+        summaries.clear()
+        latencies = []
+
+        async with ClientSession() as session:
+            async def user(preferences):
+                start = time.perf_counter()
+                await asyncio.gather(*(lookup(session, category) for category in preferences))
+                latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(user(preferences) for preferences in users))
+            wall = time.perf_counter() - start
+
+        result = summarize(name, latencies, wall)
+        result["news_api_calls"] = fake_api.calls
+        result["summaries"] = len(summaries)
+        result["coalescing"] = news_app.category_flight.stats()
+        return result
+
+    results = [
+        asyncio.run(run("before: no coalescing", uncoalesced)),
+        asyncio.run(run("after: single-flight", news_app.get_cached_or_fresh_news)),
+    ]
+    server.should_exit = True
+
+    print_results(results)
+    for r in results:
+        print(f"{r['name']}: news API calls={r['news_api_calls']} summaries={r['summaries']} "
+              f"coalescing={r['coalescing']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--api-latency-ms", type=float, default=50)
+    parser.add_argument("--summary-latency-ms", type=float, default=200)
+    main(parser.parse_args())
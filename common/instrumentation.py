@@ -0,0 +1,277 @@
+"""Prometheus metrics and W3C trace context shared by every service.
+
+Every service's Dockerfile copies common/ next to its code (FastApi, FlaskServiceManager
+and its sub-services), so this is the only copy. Each service serves its own /metrics,
+so metrics carry no service label, Prometheus adds the job/instance of the target.
+
+    instrument_flask(app) / instrument_asgi(app)   route latency, in-flight requests, /metrics
+                                                   and the incoming traceparent
+    time_upstream("gemini", "generate_content")    timer for a call to another system
+    record_cache("summary", "hit")                 cache lookup counter
+    trace_headers()                                traceparent for an outgoing call
+"""
+import contextvars
+import os
+import re
+import secrets
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+REQUEST_LATENCY = Histogram(
+    "http_server_request_duration_seconds", "Time to handle an HTTP request",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge("http_server_requests_in_flight", "HTTP requests being handled")
+UPSTREAM_LATENCY = Histogram(
+    "upstream_call_duration_seconds", "Time of calls to other services and external systems",
+    ["upstream", "operation", "outcome"], buckets=LATENCY_BUCKETS)
+UPSTREAM_IN_FLIGHT = Gauge("upstream_calls_in_flight", "Calls to other systems in progress", ["upstream"])
+CACHE_LOOKUPS = Counter("cache_lookups", "Cache lookups by result (hit, miss, stale)", ["cache", "result"])
+
+# W3C trace context: 00-<trace id>-<parent span id>-<flags>
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_trace = contextvars.ContextVar("trace_context", default=None)
+
+
+def start_trace(traceparent=None, tracestate=None):
+    """Start the server span of a request, continuing the caller's trace when the header is valid.
+
+    Returns the token for end_trace().
+    """
+    match = TRACEPARENT_RE.match((traceparent or "").strip().lower())
+    if match and match.group(1) != "0" * 32 and match.group(2) != "0" * 16:
+        trace_id, flags = match.group(1), match.group(3)
+    else:
+        trace_id, flags, tracestate = secrets.token_hex(16), "01", None
+    return _trace.set((trace_id, secrets.token_hex(8), flags, tracestate))
+
+
+def end_trace(token):
+    _trace.reset(token)
+
+
+def current_trace_id():
+    context = _trace.get()
+    return context[0] if context else None
+
+
+def trace_headers():
+    """traceparent (and tracestate) continuing the current trace, empty outside a request.
+
+    Dapr sidecars pass these headers on, so one trace spans gateway, manager and services.
+    """
+    context = _trace.get()
+    if context is None:
+        return {}
+    trace_id, span_id, flags, tracestate = context
+    headers = {"traceparent": f"00-{trace_id}-{span_id}-{flags}"}
+    if tracestate:
+        headers["tracestate"] = tracestate
+    return headers
+
+
+class time_upstream:
+    """Times a call to another system, as `with` or `async with`.
+
+    The outcome label is "error" when the block raises, otherwise `outcome` ("ok"),
+    which the block may change, e.g. to "throttled" on a 429.
+    """
+
+    def __init__(self, upstream, operation=""):
+        self.upstream = upstream
+        self.operation = operation
+        self.outcome = "ok"
+
+    def __enter__(self):
+        UPSTREAM_IN_FLIGHT.labels(self.upstream).inc()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        UPSTREAM_IN_FLIGHT.labels(self.upstream).dec()
+        outcome = "error" if exc_type is not None else self.outcome
+        UPSTREAM_LATENCY.labels(self.upstream, self.operation, outcome).observe(elapsed)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def record_cache(cache, result):
+    CACHE_LOOKUPS.labels(cache, result).inc()
+
+
+def metrics_payload():
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def instrument_flask(app):
+    """Time every request of a Flask app, pick up its traceparent and serve /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_request():
+        g._metrics_start = time.perf_counter()
+        g._metrics_status = 500
+        g._trace_token = start_trace(request.headers.get("traceparent"), request.headers.get("tracestate"))
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _record_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_request(exception=None):
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return
+        REQUESTS_IN_FLIGHT.dec()
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_LATENCY.labels(request.method, route, str(g.pop("_metrics_status", 500))).observe(
+            time.perf_counter() - start)
+        end_trace(g.pop("_trace_token"))
+
+    def metrics():
+        payload, content_type = metrics_payload()
+        return Response(payload, content_type=content_type)
+
+    app.add_url_rule(METRICS_PATH, "metrics", metrics)
+    return app
+
+
+class MetricsMiddleware:
+    """ASGI middleware with the same request metrics and trace handling as instrument_flask."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        token = start_trace(headers.get(b"traceparent", b"").decode("latin-1") or None,
+                            headers.get(b"tracestate", b"").decode("latin-1") or None)
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope, its path is the label. /metrics
+            # is a plain Starlette route, which does not store itself
+            route = getattr(scope.get("route"), "path", None)
+            if route is None:
+                route = METRICS_PATH if scope.get("path") == METRICS_PATH else "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], route, str(status[0])).observe(time.perf_counter() - start)
+            end_trace(token)
+
+
+def instrument_asgi(app):
+    """Add MetricsMiddleware and /metrics to a FastAPI/Starlette app."""
+    from starlette.responses import Response
+
+    async def metrics(request):
+        payload, content_type = metrics_payload()
+        return Response(payload, media_type=content_type)
+
+    app.add_middleware(MetricsMiddleware)
+    app.add_route(METRICS_PATH, metrics, include_in_schema=False)
+    return app
+
+
+def instrument_sqlalchemy(engine):
+    """Time every statement run on the engine as upstream "postgres", by statement type."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_start", []).append(time.perf_counter())
+        UPSTREAM_IN_FLIGHT.labels("postgres").inc()
+
+    def _finish(conn, statement, outcome):
+        starts = conn.info.get("_metrics_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        UPSTREAM_IN_FLIGHT.labels("postgres").dec()
+        operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+        UPSTREAM_LATENCY.labels("postgres", operation, outcome).observe(elapsed)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _finish(conn, statement, "ok")
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        if exception_context.connection is not None:
+            _finish(exception_context.connection, exception_context.statement or "", "error")
+
+
+def httpx_transport(upstream=None, **kwargs):
+    """httpx async transport that adds the trace headers and times each call.
+
+    The upstream label is `upstream` or the host called (the Dapr sidecar of the target
+    app). kwargs go to httpx.AsyncHTTPTransport, pass the pool limits there.
+    """
+    import httpx
+
+    class InstrumentedTransport(httpx.AsyncHTTPTransport):
+        async def handle_async_request(self, request):
+            for name, value in trace_headers().items():
+                request.headers[name] = value
+            async with time_upstream(upstream or request.url.host, request.method) as timer:
+                response = await super().handle_async_request(request)
+                if response.status_code >= 500:
+                    timer.outcome = "error"
+                return response
+
+    return InstrumentedTransport(**kwargs)
+
+
+def aiohttp_trace_config():
+    """aiohttp TraceConfig adding the trace headers and timing each request.
+
+    The upstream label is the host, or trace_request_ctx={"upstream": ...} of the request.
+    With {"propagate": False} no trace headers are sent (external APIs).
+    """
+    import aiohttp
+
+    async def on_request_start(session, context, params):
+        options = context.trace_request_ctx or {}
+        if options.get("propagate", True):
+            for name, value in trace_headers().items():
+                params.headers[name] = value
+        context.timer = time_upstream(options.get("upstream") or params.url.host, params.method)
+        context.timer.__enter__()
+
+    async def on_request_end(session, context, params):
+        if params.response.status >= 500:
+            context.timer.outcome = "error"
+        context.timer.__exit__(None, None, None)
+
+    async def on_request_exception(session, context, params):
+        context.timer.__exit__(type(params.exception), params.exception, None)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
@@ -0,0 +1,265 @@
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from functools import partial
+
+import pika
+
+logger = logging.getLogger(__name__)
+
+
+class PublishError(Exception):
+    """Set on a publish future when the broker nacks the message or its channel fails."""
+
+
+class PublishNacked(PublishError):
+    """The broker nacked the message: it was definitely not queued."""
+
+
+class RabbitMQPublisher:
+    """Long-lived RabbitMQ publisher shared by all request threads.
+
+    A single connection runs its ioloop on a background thread and keeps a pool of
+    channels in confirm mode. Request threads only put messages in an outbox and get a
+    Future back, the ioloop thread does all the AMQP work, so the publisher is thread
+    safe. Queue declarations are cached per connection, confirms from the broker are
+    applied in batches (multiple=True acks) and the connection is reopened after a
+    failure, republishing every unconfirmed message.
+    """
+
+    def __init__(self, url, channel_count=4, queues=(), reconnect_delay=2.0,
+                 connection_factory=pika.SelectConnection):
+        self._url = url
+        self._channel_count = channel_count
+        self._queues = tuple(queues)
+        self._reconnect_delay = reconnect_delay
+        self._connection_factory = connection_factory
+
+        self._outbox = queue.SimpleQueue()
+        self._start_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._drain_scheduled = False
+        self._stopping = threading.Event()
+        self._thread = None
+        self._connection = None
+
+        # State below is only touched from the ioloop thread
+        self._backlog = deque()
+        self._channels = []
+        self._pending = {}
+        self._delivery_tags = {}
+        self._declared = set()
+        # Queue name -> number of the channel its declare was sent on
+        self._declaring = {}
+        self._next_channel = 0
+
+    def publish(self, queue_name, message):
+        """Queue a persistent message, the returned Future resolves once the broker confirms it."""
+        future = Future()
+        self._outbox.put((queue_name, json.dumps(message), future))
+        self._ensure_started()
+        self._schedule_drain()
+        return future
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.ioloop.add_callback_threadsafe(connection.close)
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rabbitmq-publisher", daemon=True)
+                self._thread.start()
+
+    def _schedule_drain(self):
+        with self._drain_lock:
+            if self._drain_scheduled:
+                return
+            connection = self._connection
+            if connection is None:
+                # Not connected yet, the outbox is drained once the channels are open
+                return
+            try:
+                connection.ioloop.add_callback_threadsafe(self._drain)
+                self._drain_scheduled = True
+            except Exception:
+                pass
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                connection = self._connection_factory(
+                    pika.URLParameters(self._url),
+                    on_open_callback=self._on_connection_open,
+                    on_open_error_callback=self._on_connection_open_error,
+                    on_close_callback=self._on_connection_closed,
+                )
+                with self._drain_lock:
+                    self._connection = connection
+                    self._drain_scheduled = False
+                connection.ioloop.start()
+            except Exception as e:
+                logger.error(f"RabbitMQ publisher connection failed: {e}")
+            self._reset_connection_state()
+            if not self._stopping.is_set():
+                logger.info(f"Reconnecting to RabbitMQ in {self._reconnect_delay} seconds...")
+                time.sleep(self._reconnect_delay)
+
+    def _reset_connection_state(self):
+        with self._drain_lock:
+            self._connection = None
+            self._drain_scheduled = False
+        for channel_number in list(self._pending):
+            self._requeue_pending(channel_number)
+        self._channels = []
+        self._pending = {}
+        self._delivery_tags = {}
+        self._declared = set()
+        self._declaring = {}
+
+    def _on_connection_open(self, connection):
+        logger.info("RabbitMQ publisher connected")
+        for _ in range(self._channel_count):
+            connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_open_error(self, connection, error):
+        logger.error(f"Failed to connect to RabbitMQ: {error}")
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason):
+        logger.warning(f"RabbitMQ publisher connection closed: {reason}")
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel):
+        channel.add_on_close_callback(self._on_channel_closed)
+        channel.confirm_delivery(
+            ack_nack_callback=partial(self._on_confirm, channel.channel_number),
+            callback=lambda _frame: self._on_confirm_selected(channel),
+        )
+
+    def _on_confirm_selected(self, channel):
+        self._channels.append(channel)
+        self._pending[channel.channel_number] = OrderedDict()
+        self._delivery_tags[channel.channel_number] = 0
+        for queue_name in self._queues:
+            self._declare(queue_name)
+        self._drain()
+
+    def _on_channel_closed(self, channel, reason):
+        channel_number = channel.channel_number
+        if channel in self._channels:
+            self._channels.remove(channel)
+        connection = self._connection
+        if connection is not None and connection.is_open and not self._stopping.is_set():
+            # Only this channel failed, fail its messages and open a replacement
+            logger.warning(f"RabbitMQ channel {channel_number} closed: {reason}")
+            for _, _, future in self._pending.pop(channel_number, {}).values():
+                future.set_exception(PublishError(f"Channel closed: {reason}"))
+            # Declares sent on this channel get no answer, send them again on another one
+            for queue_name in [name for name, number in self._declaring.items() if number == channel_number]:
+                del self._declaring[queue_name]
+            self._delivery_tags.pop(channel_number, None)
+            connection.channel(on_open_callback=self._on_channel_open)
+        else:
+            self._requeue_pending(channel_number)
+
+    def _requeue_pending(self, channel_number):
+        # Unconfirmed messages are published again after reconnect (at-least-once)
+        pending = self._pending.pop(channel_number, None)
+        if pending:
+            self._backlog.extendleft(reversed(list(pending.values())))
+        self._delivery_tags.pop(channel_number, None)
+
+    def _declare(self, queue_name):
+        if queue_name in self._declared or queue_name in self._declaring or not self._channels:
+            return
+        self._declaring[queue_name] = self._channels[0].channel_number
+        self._channels[0].queue_declare(
+            queue=queue_name, durable=True,
+            callback=lambda _frame: self._on_queue_declared(queue_name),
+        )
+
+    def _on_queue_declared(self, queue_name):
+        self._declaring.pop(queue_name, None)
+        self._declared.add(queue_name)
+        self._drain()
+
+    def _drain(self):
+        with self._drain_lock:
+            self._drain_scheduled = False
+        while True:
+            try:
+                self._backlog.append(self._outbox.get_nowait())
+            except queue.Empty:
+                break
+        if not self._channels:
+            return
+
+        waiting = deque()
+        while self._backlog:
+            item = self._backlog.popleft()
+            queue_name = item[0]
+            if queue_name not in self._declared:
+                self._declare(queue_name)
+                waiting.append(item)
+                continue
+            if not self._publish_item(item):
+                waiting.append(item)
+        self._backlog = waiting
+
+    def _publish_item(self, item):
+        queue_name, body, future = item
+        if future.done():
+            return True
+        channel = self._channels[self._next_channel % len(self._channels)]
+        self._next_channel += 1
+        try:
+            channel.basic_publish(
+                exchange='',
+                routing_key=queue_name,
+                body=body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2,  # make message persistent
+                ))
+        except Exception as e:
+            logger.error(f"Failed to publish to queue {queue_name}: {e}")
+            return False
+        channel_number = channel.channel_number
+        self._delivery_tags[channel_number] += 1
+        self._pending[channel_number][self._delivery_tags[channel_number]] = item
+        return True
+
+    def _on_confirm(self, channel_number, frame):
+        pending = self._pending.get(channel_number)
+        if not pending:
+            return
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            confirmed = []
+            while pending and next(iter(pending)) <= method.delivery_tag:
+                confirmed.append(pending.popitem(last=False)[1])
+        else:
+            item = pending.pop(method.delivery_tag, None)
+            confirmed = [item] if item else []
+
+        for queue_name, _, future in confirmed:
+            if future.done():
+                continue
+            if acked:
+                future.set_result(True)
+            else:
+                future.set_exception(PublishNacked(f"Broker rejected message for queue {queue_name}"))
@@ -0,0 +1,219 @@
+"""JSON logging through a queue, shared by every service.
+
+Copied into every service image from common/, next to instrumentation.py.
+configure_logging() replaces the root handlers with a
+QueueHandler: the request thread only puts the record on a bounded queue, a writer
+thread formats the queued records and writes them to stdout in batches. Records are
+dropped (and counted) when the queue is full instead of blocking requests.
+
+Messages are formatted by the writer thread, so log arguments must not be mutated
+after the call. Large bodies go through payload() (truncated) or log_payload()
+(sampled and truncated).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+from instrumentation import current_trace_id
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-module levels by logger name, "httpx=WARNING,news_cache=DEBUG"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING,httpcore=WARNING,pika=WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Most records written per write() call by the writer thread
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+# Request/response bodies are cut to LOG_PAYLOAD_MAX_CHARS and log_payload() keeps only
+# LOG_PAYLOAD_SAMPLE_RATE of them
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "1000"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+# Any message longer than this is cut as well
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "4000"))
+
+
+def truncate(text, limit):
+    if limit is None or len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+class payload:
+    """Log argument that renders a (large) value cut to `limit` characters.
+
+    str() runs when the writer thread formats the record, not on the request thread.
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit=None):
+        self.value = value
+        self.limit = LOG_PAYLOAD_MAX_CHARS if limit is None else limit
+
+    def __str__(self):
+        return truncate(str(self.value), self.limit)
+
+
+def log_payload(logger, level, message, value, *args, sample_rate=None):
+    """Log `message: <value>` for a sample of the calls, with the value truncated."""
+    rate = LOG_PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate
+    if not logger.isEnabledFor(level) or random.random() >= rate:
+        return
+    logger.log(level, f"{message}: %s", *args, payload(value))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, service, trace id and exception."""
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": truncate(record.getMessage(), LOG_MAX_MESSAGE_CHARS),
+            "service": self.service,
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def formatMessage(self, record):
+        record.message = truncate(record.message, LOG_MAX_MESSAGE_CHARS)
+        return super().formatMessage(record)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the writer thread and never blocks.
+
+    prepare() only attaches the request's trace id. A full queue drops the record.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record.trace_id = current_trace_id()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogWriter:
+    """Thread that takes records off the queue, formats them and writes them in batches.
+
+    Everything queued is written with one write() and flush, so a burst costs a few
+    system calls instead of one per record.
+    """
+
+    _STOP = object()
+
+    def __init__(self, log_queue, formatter, stream, batch_size=LOG_BATCH_SIZE):
+        self.queue = log_queue
+        self.formatter = formatter
+        self.stream = stream
+        self.batch_size = batch_size
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write what is queued and stop the thread."""
+        if self._thread is not None:
+            self.queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._STOP in batch
+            self._write([record for record in batch if record is not self._STOP])
+            if stop:
+                return
+
+    def _write(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                lines.append(f"Failed to format log record from {record.name}: {record.msg!r}")
+        if not lines:
+            return
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except Exception as e:
+            sys.stderr.write(f"Failed to write {len(lines)} log records: {e}\n")
+
+
+def parse_levels(levels):
+    parsed = {}
+    for item in (levels or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            parsed[name.strip()] = level.strip().upper()
+    return parsed
+
+
+_writer = None
+
+
+def configure_logging(service, level=LOG_LEVEL, levels=LOG_LEVELS, log_format=LOG_FORMAT, stream=None,
+                      queue_size=LOG_QUEUE_SIZE):
+    """Route the root logger through the queue, returns the queue handler (see `dropped`)."""
+    global _writer
+    if _writer is None:
+        atexit.register(stop_logging)
+    else:
+        _writer.stop()
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+    for name, module_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    formatter = JsonFormatter(service) if log_format == "json" else TextFormatter()
+    _writer = LogWriter(queue_handler.queue, formatter, stream or sys.stdout)
+    _writer.start()
+    return queue_handler
+
+
+def stop_logging():
+    """Write what is queued and stop the writer thread."""
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None